@@ -0,0 +1 @@
+"""Define benchmarks for py17track's hot paths."""
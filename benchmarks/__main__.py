@@ -0,0 +1,271 @@
+"""Run the benchmark suite.
+
+Usage: python -m benchmarks [--sizes 100 10000 100000] [--repeat 3]
+                            [--save results.json] [--compare results.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from py17track import Client
+from py17track.batch import PackageBatch
+from py17track.emulator import (
+    Emulator,
+    packages_response,
+    synthetic_rows,
+    track_response,
+)
+from py17track.package import CompactPackage, LazyPackage, Package
+from py17track.profile import API_URL_BUYER, Profile
+
+DEFAULT_SIZES: List[int] = [100, 10_000, 100_000]
+DEFAULT_REPEAT: int = 3
+DEFAULT_REQUESTS: int = 200
+DEFAULT_THRESHOLD: float = 0.2
+
+Results = Dict[str, Dict[str, float]]
+
+
+def construct_packages(rows: List[dict]) -> List[Package]:
+    """Construct packages one at a time (the way bulk construction avoids)."""
+    packages = []
+    for row in rows:
+        event = json.loads(row["FLastEvent"]) if row.get("FLastEvent") else {}
+        packages.append(
+            Package(
+                row["FTrackNo"],
+                id=row.get("FTrackInfoId"),
+                destination_country=row.get("FSecondCountry", 0),
+                friendly_name=row.get("FRemark"),
+                info_text=event.get("z"),
+                location=" ".join([event.get("c", ""), event.get("d", "")]).strip(),
+                timestamp=event.get("a"),
+                origin_country=row.get("FFirstCountry", 0),
+                package_type=row.get("FTrackStateType", 0),
+                status=row.get("FPackageState", 0),
+            )
+        )
+    return packages
+
+
+def decode_lazy_packages(rows: List[dict]) -> List[LazyPackage]:
+    """Construct lazy packages and access every field."""
+    packages = [LazyPackage(row) for row in rows]
+    for package in packages:
+        _ = (package.status, package.location, package.timestamp)
+    return packages
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """Return the fastest of several runs of a function (in seconds)."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def async_best_of(func: Callable[[], Any], repeat: int) -> float:
+    """Return the fastest of several runs of a coroutine function (in seconds)."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bytes_per_item(func: Callable[[], Any], count: int) -> float:
+    """Return how much memory (per item) the result of a function holds onto."""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / max(count, 1)
+
+
+def bench_construction(rows: List[dict], repeat: int) -> Dict[str, float]:
+    """Time package construction (in seconds)."""
+    track_rows = track_response(rows)["dat"]
+    return {
+        "Package() loop": best_of(lambda: construct_packages(rows), repeat),
+        "Package.from_profile_rows": best_of(
+            lambda: Package.from_profile_rows(rows), repeat
+        ),
+        "Package.from_track_rows": best_of(
+            lambda: Package.from_track_rows(track_rows), repeat
+        ),
+        "LazyPackage (all fields)": best_of(lambda: decode_lazy_packages(rows), repeat),
+        "CompactPackage.from_row": best_of(
+            lambda: [CompactPackage.from_row(row) for row in rows], repeat
+        ),
+        "PackageBatch.from_profile_rows": best_of(
+            lambda: PackageBatch.from_profile_rows(rows), repeat
+        ),
+    }
+
+
+def bench_memory(rows: List[dict]) -> Dict[str, float]:
+    """Measure memory per package (in bytes, excluding the raw rows)."""
+    return {
+        "Package": bytes_per_item(lambda: Package.from_profile_rows(rows), len(rows)),
+        "LazyPackage (all fields)": bytes_per_item(
+            lambda: decode_lazy_packages(rows), len(rows)
+        ),
+        "CompactPackage": bytes_per_item(
+            lambda: [CompactPackage.from_row(row) for row in rows], len(rows)
+        ),
+        "PackageBatch": bytes_per_item(
+            lambda: PackageBatch.from_profile_rows(rows), len(rows)
+        ),
+    }
+
+
+async def bench_profile(rows: List[dict], repeat: int) -> Dict[str, float]:
+    """Time Profile.packages() parsing of a single, pre-decoded response."""
+    response = packages_response(rows)
+
+    async def request(*_: Any, **__: Any) -> dict:
+        """Return the canned response."""
+        return response
+
+    profile = Profile(request)
+    return {
+        "Profile.packages()": await async_best_of(
+            lambda: profile.packages(page_size=len(rows)), repeat
+        ),
+        "Profile.packages(lazy=True)": await async_best_of(
+            lambda: profile.packages(page_size=len(rows), lazy=True), repeat
+        ),
+    }
+
+
+async def bench_client(
+    rows: List[dict], emulator: Emulator, repeat: int, requests: int
+) -> Dict[str, float]:
+    """Time requests against the emulator (in seconds)."""
+    payload = {
+        "version": "1.0",
+        "method": "GetIndexData",
+        "param": {"IsArchived": False},
+        "sourcetype": 0,
+    }
+
+    async with emulator.session() as session:
+        client = Client(session=session)
+        await client.profile.login("user@email.com", "password")
+
+        async def raw_requests() -> None:
+            """Make requests with aiohttp alone."""
+            for _ in range(requests):
+                async with session.post(API_URL_BUYER, json=payload) as resp:
+                    await resp.json()
+
+        async def client_requests() -> None:
+            """Make the same requests with the client."""
+            for _ in range(requests):
+                await client._request(  # pylint: disable=protected-access
+                    "post", API_URL_BUYER, json=payload
+                )
+
+        raw = await async_best_of(raw_requests, repeat)
+        wrapped = await async_best_of(client_requests, repeat)
+        listing = await async_best_of(
+            lambda: client.profile.packages(fetch_all=True), repeat
+        )
+
+    return {
+        "aiohttp request": raw / requests,
+        "Client._request": wrapped / requests,
+        "Client._request overhead": (wrapped - raw) / requests,
+        "Profile.packages(fetch_all=True)": listing,
+    }
+
+
+async def run(sizes: List[int], repeat: int, requests: int) -> Results:
+    """Run every benchmark for every size."""
+    results: Results = {}
+    for size in sizes:
+        rows = synthetic_rows(size)
+        emulator = Emulator()
+        emulator.add_account("user@email.com", "password", rows=rows)
+        async with emulator:
+            results[str(size)] = {
+                **{
+                    f"time: {name}": value
+                    for name, value in bench_construction(rows, repeat).items()
+                },
+                **{
+                    f"time: {name}": value
+                    for name, value in (await bench_profile(rows, repeat)).items()
+                },
+                **{
+                    f"time: {name}": value
+                    for name, value in (
+                        await bench_client(rows, emulator, repeat, requests)
+                    ).items()
+                },
+                **{
+                    f"bytes/package: {name}": value
+                    for name, value in bench_memory(rows).items()
+                },
+            }
+    return results
+
+
+def report(results: Results, baseline: Optional[Results], threshold: float) -> bool:
+    """Print the results (and any regressions); return whether there were any."""
+    regressed = False
+    for size, measurements in results.items():
+        print(f"\n{size} rows")
+        for name, value in measurements.items():
+            line = f"  {name:<45} {value:>14.6f}"
+            previous = (baseline or {}).get(size, {}).get(name)
+            if previous:
+                change = (value - previous) / previous
+                line += f"  ({change:+.1%})"
+                if change > threshold and not name.endswith("overhead"):
+                    line += "  REGRESSION"
+                    regressed = True
+            print(line)
+    return regressed
+
+
+def main() -> None:
+    """Parse arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument("--save", help="save the results to a JSON file")
+    parser.add_argument("--compare", help="compare against previously-saved results")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.repeat, args.requests))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fptr:
+            baseline = json.load(fptr)
+    regressed = report(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fptr:
+            json.dump(results, fptr, indent=2)
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
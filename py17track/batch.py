@@ -0,0 +1,188 @@
+"""Define a columnar container for large numbers of packages."""
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from .codec import DEFAULT_CODEC, JSONCodec
+from .package import PACKAGE_STATUS_NAMES, CompactPackage, TimestampParser
+
+# Sentinel epoch value for packages that have no last event timestamp:
+NO_TIMESTAMP: int = -(2**63)
+
+
+class StringTable:
+    """Define a table that stores each distinct string exactly once."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._indices: Dict[Optional[str], int] = {}
+        self.values: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        """Return the number of distinct strings."""
+        return len(self.values)
+
+    def intern(self, value: Optional[str]) -> int:
+        """Return the index of a string, adding it to the table if needed."""
+        try:
+            return self._indices[value]
+        except KeyError:
+            index = self._indices[value] = len(self.values)
+            self.values.append(value)
+            return index
+
+
+class PackageBatch:  # pylint: disable=too-many-instance-attributes
+    """Define a columnar batch of packages.
+
+    Status, package type and countries are held as small integer arrays, timestamps
+    as epoch integers and repeated strings (locations, event texts, etc.) as indices
+    into a shared StringTable.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.strings: StringTable = StringTable()
+
+        self.tracking_numbers: List[str] = []
+        self.ids: List[Optional[str]] = []
+        self.friendly_names: array = array("I")
+        self.info_texts: array = array("I")
+        self.locations: array = array("I")
+        self.tracking_info_languages: array = array("I")
+        self.destination_countries: array = array("H")
+        self.origin_countries: array = array("H")
+        self.package_types: array = array("h")
+        self.statuses: array = array("i")
+        self.timestamps: array = array("q")
+
+    def __getitem__(self, index: int) -> CompactPackage:
+        """Return a single package."""
+        epoch: Optional[int] = self.timestamps[index]
+        if epoch == NO_TIMESTAMP:
+            epoch = None
+
+        return CompactPackage(
+            self.tracking_numbers[index],
+            id=self.ids[index],
+            friendly_name=self.strings.values[self.friendly_names[index]],
+            info_text=self.strings.values[self.info_texts[index]],
+            location=self.strings.values[self.locations[index]],  # type: ignore
+            destination_country_code=self.destination_countries[index],
+            origin_country_code=self.origin_countries[index],
+            package_type_code=self.package_types[index],
+            status_code=self.statuses[index],
+            epoch=epoch,
+            tracking_info_language=self.strings.values[  # type: ignore
+                self.tracking_info_languages[index]
+            ],
+        )
+
+    def __iter__(self) -> Iterator[CompactPackage]:
+        """Iterate over every package."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def __len__(self) -> int:
+        """Return the number of packages."""
+        return len(self.tracking_numbers)
+
+    @classmethod
+    def from_profile_rows(
+        cls, rows: Iterable[dict], tz: str = "UTC", codec: JSONCodec = DEFAULT_CODEC
+    ) -> "PackageBatch":
+        """Create a batch from raw package list (GetTrackInfoList) rows."""
+        batch = cls()
+        batch.extend_profile_rows(rows, tz, codec)
+        return batch
+
+    def append(self, package: CompactPackage) -> None:
+        """Add a single package."""
+        intern = self.strings.intern
+
+        self.tracking_numbers.append(package.tracking_number)
+        self.ids.append(package.id)
+        self.friendly_names.append(intern(package.friendly_name))
+        self.info_texts.append(intern(package.info_text))
+        self.locations.append(intern(package.location))
+        self.tracking_info_languages.append(intern(package.tracking_info_language))
+        self.destination_countries.append(package.destination_country_code)
+        self.origin_countries.append(package.origin_country_code)
+        self.package_types.append(package.package_type_code)
+        self.statuses.append(package.status_code)
+        self.timestamps.append(NO_TIMESTAMP if package.epoch is None else package.epoch)
+
+    def extend_profile_rows(
+        self, rows: Iterable[dict], tz: str = "UTC", codec: JSONCodec = DEFAULT_CODEC
+    ) -> None:
+        """Add raw package list (GetTrackInfoList) rows."""
+        intern = self.strings.intern
+        language = intern("Unknown")
+        parse = TimestampParser(tz)
+
+        for row in rows:
+            event: dict = {}
+            last_event_raw: Optional[str] = row.get("FLastEvent")
+            if last_event_raw:
+                event = codec.loads(last_event_raw)
+
+            epoch = NO_TIMESTAMP
+            if event.get("a") is not None:
+                epoch = int(parse(event["a"]).timestamp())
+
+            self.tracking_numbers.append(row["FTrackNo"])
+            self.ids.append(row.get("FTrackInfoId"))
+            self.friendly_names.append(intern(row.get("FRemark")))
+            self.info_texts.append(intern(event.get("z")))
+            self.locations.append(
+                intern(" ".join([event.get("c", ""), event.get("d", "")]).strip())
+            )
+            self.tracking_info_languages.append(language)
+            self.destination_countries.append(row.get("FSecondCountry", 0))
+            self.origin_countries.append(row.get("FFirstCountry", 0))
+            self.package_types.append(row.get("FTrackStateType", 0))
+            self.statuses.append(row.get("FPackageState", 0))
+            self.timestamps.append(epoch)
+
+    def indices(
+        self,
+        *,
+        status: Optional[Iterable[Union[int, str]]] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> List[int]:
+        """Return the indices of packages matching every given criterion.
+
+        status may contain status codes or names (e.g. "In Transit"); since and until
+        are inclusive epoch bounds on the last event timestamp.
+        """
+        result: Iterable[int] = range(len(self))
+
+        if status is not None:
+            codes = {
+                PACKAGE_STATUS_NAMES.get(value, -1) if isinstance(value, str) else value
+                for value in status
+            }
+            statuses = self.statuses
+            result = [index for index in result if statuses[index] in codes]
+
+        if since is not None or until is not None:
+            lower = NO_TIMESTAMP + 1 if since is None else since
+            upper = 2**63 - 1 if until is None else until
+            timestamps = self.timestamps
+            result = [index for index in result if lower <= timestamps[index] <= upper]
+
+        return list(result)
+
+    def select(self, indices: Iterable[int]) -> "PackageBatch":
+        """Return a new batch containing only the packages at the given indices."""
+        batch = PackageBatch()
+        for index in indices:
+            batch.append(self[index])
+        return batch
+
+    def filter(self, **criteria) -> "PackageBatch":
+        """Return a new batch containing only the packages matching the criteria.
+
+        Accepts the same criteria as indices().
+        """
+        return self.select(self.indices(**criteria))
@@ -0,0 +1,126 @@
+"""Define an in-memory cache for read-only API responses."""
+from collections import OrderedDict
+import time
+from typing import Dict, FrozenSet, Hashable, Optional, Tuple
+
+from .track import API_URL_TRACK
+
+DEFAULT_MAX_SIZE: int = 256
+
+# The default number of seconds that responses from each read-only API method (the
+# tracking API has no method name, so it is identified by its URL) are cached for:
+DEFAULT_TTLS: Dict[str, float] = {
+    "GetIndexData": 30.0,
+    "GetTrackInfoList": 30.0,
+    API_URL_TRACK: 60.0,
+}
+
+# The cached API methods whose responses become stale when a mutating API method is
+# called for the same account (even if it reports an error, since it may have partially
+# taken effect):
+INVALIDATED_BY: Dict[str, FrozenSet[str]] = {
+    "AddTrackNo": frozenset({"GetIndexData", "GetTrackInfoList"}),
+    "SetTrackRemark": frozenset({"GetTrackInfoList"}),
+}
+
+_ALL_ACCOUNTS = object()
+
+
+class ResponseCache:
+    """Define a TTL response cache with bounded, least-recently-used eviction.
+
+    Entries are keyed by account and request parameters; cached responses are shared
+    (not copied), so they shouldn't be modified. generation is incremented by every
+    invalidation, so that a response requested before one can be kept out of the cache.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttls: Optional[Dict[str, float]] = None,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        """Initialize."""
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Optional[str], dict]]"
+        self._entries = OrderedDict()
+        self.generation: int = 0
+        self.hits: int = 0
+        self.max_size: int = max_size
+        self.misses: int = 0
+        self.ttls: Dict[str, float] = DEFAULT_TTLS if ttls is None else ttls
+
+    def __len__(self) -> int:
+        """Return the number of cached responses."""
+        return len(self._entries)
+
+    def caches(self, api_method: str) -> bool:
+        """Return whether responses for an API method are cached."""
+        return api_method in self.ttls
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        """Get a cached response (or None if it is missing or expired)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, _, _, data = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def set(  # pylint: disable=too-many-arguments
+        self,
+        key: Hashable,
+        api_method: str,
+        account_id: Optional[str],
+        data: dict,
+        *,
+        generation: Optional[int] = None,
+    ) -> None:
+        """Cache a response.
+
+        If given, generation is the cache's generation when the response was requested;
+        the response is discarded if anything has been invalidated since.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        expires_at = time.monotonic() + self.ttls[api_method]
+        self._entries[key] = (expires_at, api_method, account_id, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(
+        self,
+        *,
+        account_id: Optional[str] = _ALL_ACCOUNTS,  # type: ignore
+        api_methods: Optional[FrozenSet[str]] = None,
+    ) -> int:
+        """Remove cached responses and return how many were removed.
+
+        With no arguments, every response is removed; otherwise, only those matching
+        the given account and/or API methods are.
+        """
+        self.generation += 1
+        stale = [
+            key
+            for key, (_, api_method, entry_account_id, _) in self._entries.items()
+            if (account_id is _ALL_ACCOUNTS or entry_account_id == account_id)
+            and (api_methods is None or api_method in api_methods)
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def invalidate_after(self, api_method: str, account_id: Optional[str]) -> int:
+        """Remove the responses made stale by a call to a mutating API method."""
+        api_methods = INVALIDATED_BY.get(api_method)
+        if not api_methods:
+            return 0
+        return self.invalidate(account_id=account_id, api_methods=api_methods)
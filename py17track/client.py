@@ -1,28 +1,250 @@
 """Define a 17track.net client."""
-from typing import Optional
+import asyncio
+from contextlib import AsyncExitStack
+from http.cookies import Morsel
+from json import dumps
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
 
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import BaseConnector, ClientSession, ClientTimeout, TCPConnector
 from aiohttp.client_exceptions import ClientError
+from yarl import URL
 
+from .cache import ResponseCache
+from .codec import DEFAULT_CODEC, JSONCodec, get_codec
 from .errors import RequestError
+from .metrics import RequestMetrics, RequestTrace, trace_config
 from .profile import Profile
+from .ratelimit import RateLimiter
+from .retry import (
+    IDEMPOTENT_METHODS,
+    CircuitBreaker,
+    RetryPolicy,
+    is_transient_error,
+)
 
 # from .track import Track
 
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTION_LIMIT: int = 100
+DEFAULT_CONNECTION_LIMIT_PER_HOST: int = 0
+DEFAULT_DNS_CACHE_TTL: int = 300
+DEFAULT_KEEPALIVE_TIMEOUT: float = 15.0
 DEFAULT_TIMEOUT: int = 10
 
 
-class Client:  # pylint: disable=too-few-public-methods
-    """Define the client."""
+def _update_cookies(session: ClientSession, cookies: List[Dict[str, Any]]) -> None:
+    """Add exported cookies (see Client.export_session) to a session's cookie jar."""
+    for cookie in cookies:
+        morsel: Morsel = Morsel()
+        morsel.set(cookie["name"], cookie["value"], cookie["value"])
+        morsel["domain"] = cookie["domain"]
+        morsel["path"] = cookie["path"] or "/"
+        session.cookie_jar.update_cookies(
+            {cookie["name"]: morsel},
+            response_url=URL(f"https://{cookie['domain'].lstrip('.')}"),
+        )
+
+
+class Client:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """Define the client.
+
+    If no session is provided, the client creates (and owns) a single pooled
+    ClientSession the first time it makes a request and reuses it until close() is
+    called; the client can also be used as an async context manager.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        session: Optional[ClientSession] = None,
+        connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+        connection_limit_per_host: int = DEFAULT_CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: Optional[int] = DEFAULT_DNS_CACHE_TTL,
+        timeout: int = DEFAULT_TIMEOUT,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        coalesce_requests: bool = True,
+        cache: Optional[ResponseCache] = None,
+        session_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        connector: Optional[BaseConnector] = None,
+        max_concurrent_requests: Optional[int] = None,
+        request_semaphore: Optional[asyncio.Semaphore] = None,
+        codec: Union[JSONCodec, str, None] = None,
+        metrics: Optional[RequestMetrics] = None,
+        on_request: Optional[Callable[[RequestTrace], None]] = None,
+    ) -> None:
+        """Initialize.
+
+        If provided, session_callback is called with the exported session state (see
+        export_session) every time the profile logs in, so it can be persisted.
 
-    def __init__(self, *, session: Optional[ClientSession] = None) -> None:
-        """Initialize."""
+        If a connector is provided, the owned session uses it (without taking
+        ownership), which lets several clients share one connection pool while keeping
+        separate cookies. max_concurrent_requests limits this client's in-flight
+        requests; request_semaphore is an additional limit that can be shared by
+        several clients.
+
+        codec is the JSON codec (or the name of one; see py17track.codec) used to
+        encode requests and decode responses and package events; by default, the
+        fastest installed codec is used.
+
+        If provided, every request sent (i.e., not served from the cache or shared
+        with an identical in-flight request) is traced: the trace is recorded in
+        metrics and passed to on_request once the request completes or fails.
+        """
+        self._cache: Optional[ResponseCache] = cache
+        self._circuit_breaker: Optional[CircuitBreaker] = circuit_breaker
+        self._codec: JSONCodec = (
+            get_codec(codec) if isinstance(codec, str) else codec or DEFAULT_CODEC
+        )
+        self._coalesce_requests: bool = coalesce_requests
+        self._connector: Optional[BaseConnector] = connector
+        self._connection_limit: int = connection_limit
+        self._connection_limit_per_host: int = connection_limit_per_host
+        self._dns_cache_ttl: Optional[int] = dns_cache_ttl
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._keepalive_timeout: float = keepalive_timeout
+        self._max_concurrent_requests: Optional[int] = max_concurrent_requests
+        self._metrics: Optional[RequestMetrics] = metrics
+        self._on_request: Optional[Callable[[RequestTrace], None]] = on_request
+        self._owned_session: Optional[ClientSession] = None
+        self._pending_cookies: List[Dict[str, Any]] = []
+        self._rate_limiter: Optional[RateLimiter] = rate_limiter
+        self._request_semaphore: Optional[asyncio.Semaphore] = request_semaphore
+        self._retry_policy: Optional[RetryPolicy] = retry_policy
+        # Created on first use (so that it's bound to the loop the client runs in):
+        self._semaphore: Optional[asyncio.Semaphore] = None
         self._session: Optional[ClientSession] = session
+        self._session_callback: Optional[
+            Callable[[Dict[str, Any]], None]
+        ] = session_callback
+        self._timeout: int = timeout
 
-        self.profile: Profile = Profile(self._request)
+        self.profile: Profile = Profile(
+            self._request, on_login=self._handle_login, codec=self._codec
+        )
         # This is disabled until a workaround can be found:
         # self.track = Track(self._request)
 
+    async def __aenter__(self) -> "Client":
+        """Enter the client's runtime context."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Exit the client's runtime context (closing any owned session)."""
+        await self.close()
+
+    def _active_session(self) -> Optional[ClientSession]:
+        """Get the session in use (if any), without creating one."""
+        if self._session and not self._session.closed:
+            return self._session
+        if self._owned_session and not self._owned_session.closed:
+            return self._owned_session
+        return None
+
+    def _get_session(self) -> ClientSession:
+        """Get the session to use, creating the owned session if needed."""
+        session = self._active_session()
+        if session:
+            return session
+
+        self._owned_session = ClientSession(
+            connector=self._connector
+            or TCPConnector(
+                limit=self._connection_limit,
+                limit_per_host=self._connection_limit_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+                ttl_dns_cache=self._dns_cache_ttl,
+                use_dns_cache=self._dns_cache_ttl is not None,
+            ),
+            connector_owner=self._connector is None,
+            timeout=ClientTimeout(total=self._timeout),
+            trace_configs=[trace_config()],
+        )
+        # Apply the cookies imported before there was a session to hold them:
+        _update_cookies(self._owned_session, self._pending_cookies)
+        self._pending_cookies = []
+
+        return self._owned_session
+
+    async def close(self) -> None:
+        """Close the session owned by the client (if one was created)."""
+        if self._owned_session and not self._owned_session.closed:
+            await self._owned_session.close()
+        self._owned_session = None
+
+    def _handle_login(self) -> None:
+        """Pass the new session state to the session callback (if there is one)."""
+        if self._session_callback:
+            self._session_callback(self.export_session())
+
+    def export_session(self) -> Dict[str, Any]:
+        """Export the session state (account ID and cookies)."""
+        session = self._active_session()
+        if session is None:
+            cookies = list(self._pending_cookies)
+        else:
+            cookies = [
+                {
+                    "name": morsel.key,
+                    "value": morsel.value,
+                    "domain": morsel["domain"],
+                    "path": morsel["path"],
+                }
+                for morsel in session.cookie_jar
+            ]
+        return {"account_id": self.profile.account_id, "cookies": cookies}
+
+    def import_session(
+        self, state: Dict[str, Any], *, credentials: Optional[Tuple[str, str]] = None
+    ) -> None:
+        """Import session state previously returned by export_session.
+
+        The profile can then be used without logging in (until the session expires);
+        if credentials (an email and password) are provided, the profile logs in with
+        them once the session expires. This doesn't require a running event loop: if
+        the client has no session yet, the cookies are held until it creates one.
+        """
+        session = self._active_session()
+        if session is None:
+            self._pending_cookies.extend(state.get("cookies", []))
+        else:
+            _update_cookies(session, state.get("cookies", []))
+        self.profile.account_id = state.get("account_id")
+        if credentials:
+            self.profile.set_credentials(*credentials)
+
+    def save_session(self, path: str) -> None:
+        """Save the session state to a file (readable by the current user only)."""
+        with os.fdopen(
+            os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb"
+        ) as fptr:
+            # The mode only applies to new files, so tighten an existing one too:
+            os.chmod(path, 0o600)
+            fptr.write(self._codec.dumps(self.export_session()))
+
+    def load_session(
+        self, path: str, *, credentials: Optional[Tuple[str, str]] = None
+    ) -> bool:
+        """Load the session state from a file (returning whether it existed).
+
+        credentials are used to log in again once the session expires (even if the
+        file doesn't exist); see import_session.
+        """
+        if credentials:
+            self.profile.set_credentials(*credentials)
+        if not os.path.exists(path):
+            return False
+        with open(path, "rb") as fptr:
+            self.import_session(self._codec.loads(fptr.read()))
+        return True
+
     async def _request(
         self,
         method: str,
@@ -32,25 +254,211 @@ class Client:  # pylint: disable=too-few-public-methods
         params: Optional[dict] = None,
         json: Optional[dict] = None,
     ) -> dict:
-        """Make a request against the RainMachine device."""
-        use_running_session = self._session and not self._session.closed
+        """Make a request against the 17track.net API.
+
+        Concurrent, identical requests for read-only API methods (for the same account)
+        share a single in-flight request (and, therefore, the same response object).
+        If a response cache is configured, responses for the API methods it covers are
+        served from (and stored in) it, and entries made stale by mutating calls (e.g.,
+        AddTrackNo, whether or not it reports success) are invalidated (as are responses
+        that were still in flight at the time).
+        """
+        api_method: str = (json or {}).get("method", url)
+        account_id = self.profile.account_id
+        cache = self._cache
+        if cache is not None and not cache.caches(api_method):
+            cache = None
+        coalesce = self._coalesce_requests and api_method in IDEMPOTENT_METHODS
+
+        if cache is None and not coalesce:
+            try:
+                return await self._send_request(
+                    method, url, api_method, headers=headers, params=params, json=json
+                )
+            finally:
+                # Mutating calls can take (partial) effect whatever their outcome (e.g.,
+                # AddTrackNo reports an error if any number in a batch already exists):
+                if self._cache is not None:
+                    self._cache.invalidate_after(api_method, account_id)
+
+        key = (
+            method.lower(),
+            url,
+            dumps(headers, sort_keys=True),
+            dumps(params, sort_keys=True),
+            dumps(json, sort_keys=True),
+            account_id,
+        )
+
+        generation: Optional[int] = None
+        if cache is not None:
+            cached_data = cache.get(key)
+            if cached_data is not None:
+                return cached_data
+            generation = cache.generation
 
-        if use_running_session:
-            session = self._session
+        owner = True
+        if coalesce:
+            owner = key not in self._in_flight
+            if owner:
+                future = asyncio.ensure_future(
+                    self._send_request(
+                        method,
+                        url,
+                        api_method,
+                        headers=headers,
+                        params=params,
+                        json=json,
+                    )
+                )
+                future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+                self._in_flight[key] = future
+            data = await asyncio.shield(self._in_flight[key])
         else:
-            session = ClientSession(timeout=ClientTimeout(total=DEFAULT_TIMEOUT))
+            data = await self._send_request(
+                method, url, api_method, headers=headers, params=params, json=json
+            )
 
-        assert session
+        # Only the request's creator caches it (with the generation from before it was
+        # sent), so a response that was in flight during an invalidation isn't stored:
+        if owner and cache is not None and data.get("Code", 0) == 0:
+            cache.set(key, api_method, account_id, data, generation=generation)
 
+        return data
+
+    async def _send_request(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        url: str,
+        api_method: str,
+        *,
+        headers: Optional[dict] = None,
+        params: Optional[dict] = None,
+        json: Optional[dict] = None,
+    ) -> dict:
+        """Send a request (tracing it, if instrumentation is configured)."""
+        trace = RequestTrace(api_method, url, method.upper(), self.profile.account_id)
+        if self._metrics is None and self._on_request is None:
+            return await self._send_attempts(trace, headers, params, json)
+
+        start = time.monotonic()
         try:
+            return await self._send_attempts(trace, headers, params, json)
+        except Exception as err:
+            trace.error = err
+            raise
+        finally:
+            trace.latency = time.monotonic() - start
+            if self._metrics is not None:
+                self._metrics.record(trace)
+            if self._on_request:
+                try:
+                    self._on_request(trace)
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception("Error in on_request callback")
+
+    async def _send_attempts(
+        self,
+        trace: RequestTrace,
+        headers: Optional[dict],
+        params: Optional[dict],
+        json: Optional[dict],
+    ) -> dict:
+        """Send a request (retrying it, if appropriate), recording it in its trace."""
+        url, api_method = trace.url, trace.api_method
+        endpoint = (url, api_method)
+        retries = (
+            self._retry_policy.retries_for(api_method) if self._retry_policy else 0
+        )
+        session = self._get_session()
+
+        body: Optional[bytes] = None
+        if json is not None:
+            body = self._codec.dumps(json)
+            headers = {**(headers or {}), "Content-Type": "application/json"}
+
+        while True:
+            if self._circuit_breaker:
+                self._circuit_breaker.before_request(endpoint)
+
+            try:
+                data = await self._send_attempt(session, trace, headers, params, body)
+            except (ClientError, asyncio.TimeoutError) as err:
+                transient = is_transient_error(err)
+
+                if self._circuit_breaker:
+                    if transient:
+                        self._circuit_breaker.record_failure(endpoint)
+                    else:
+                        self._circuit_breaker.record_success(endpoint)
+
+                if not transient or trace.retries >= retries:
+                    raise RequestError(
+                        f"Error requesting data from {url}: {err}"
+                    ) from err
+
+                assert self._retry_policy
+                await asyncio.sleep(self._retry_policy.delay(trace.retries))
+                trace.retries += 1
+                continue
+            except asyncio.CancelledError:
+                # A cancelled attempt says nothing about the endpoint, but any trial
+                # request it was making must be released:
+                if self._circuit_breaker:
+                    self._circuit_breaker.release(endpoint)
+                raise
+            except Exception:
+                if self._circuit_breaker:
+                    self._circuit_breaker.record_failure(endpoint)
+                raise
+
+            if self._circuit_breaker:
+                self._circuit_breaker.record_success(endpoint)
+
+            return data
+
+    async def _send_attempt(  # pylint: disable=too-many-arguments
+        self,
+        session: ClientSession,
+        trace: RequestTrace,
+        headers: Optional[dict],
+        params: Optional[dict],
+        body: Optional[bytes],
+    ) -> dict:
+        """Send a single attempt of a request and decode its response."""
+        if self._rate_limiter:
+            trace.rate_limit_wait += await self._rate_limiter.acquire(
+                trace.url, self.profile.account_id
+            )
+
+        async with AsyncExitStack() as stack:
+            # Acquire this client's own slot before the shared one, so that a busy
+            # client doesn't hold shared slots while it waits:
+            wait_start = time.monotonic()
+            if self._semaphore is None and self._max_concurrent_requests:
+                self._semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+            if self._semaphore:
+                await stack.enter_async_context(self._semaphore)
+            if self._request_semaphore:
+                await stack.enter_async_context(self._request_semaphore)
+            trace.pool_wait += time.monotonic() - wait_start
+
             async with session.request(
-                method, url, headers=headers, params=params, json=json
+                trace.method,
+                trace.url,
+                headers=headers,
+                params=params,
+                data=body,
+                trace_request_ctx=trace,
             ) as resp:
+                trace.status = resp.status
+                trace.statuses.append(resp.status)
                 resp.raise_for_status()
-                data: dict = await resp.json(content_type=None)
-                return data
-        except ClientError as err:
-            raise RequestError(f"Error requesting data from {url}: {err}")
-        finally:
-            if not use_running_session:
-                await session.close()
+                raw = await resp.read()
+                trace.bytes_received = len(raw)
+
+        try:
+            return self._codec.loads(raw)
+        except Exception as err:  # pylint: disable=broad-except
+            # The codecs' decode errors don't share a base class:
+            raise RequestError(f"Invalid response from {trace.url}: {err}") from err
@@ -0,0 +1,72 @@
+"""Define pluggable JSON codecs."""
+import json
+from typing import Any, Callable, Dict, Optional, Union
+
+import attr
+
+
+@attr.s(frozen=True)
+class JSONCodec:
+    """Define a JSON codec.
+
+    dumps encodes an object to UTF-8 bytes; loads decodes either bytes or a string.
+    """
+
+    name: str = attr.ib()
+    dumps: Callable[[Any], bytes] = attr.ib()
+    loads: Callable[[Union[bytes, str]], Any] = attr.ib()
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Encode an object to JSON with the standard library."""
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _get_json_codec() -> JSONCodec:
+    """Get the standard library codec."""
+    return JSONCodec("json", _json_dumps, json.loads)
+
+
+def _get_msgspec_codec() -> JSONCodec:
+    """Get the msgspec codec."""
+    import msgspec  # pylint: disable=import-outside-toplevel
+
+    return JSONCodec(
+        "msgspec", msgspec.json.Encoder().encode, msgspec.json.Decoder().decode
+    )
+
+
+def _get_orjson_codec() -> JSONCodec:
+    """Get the orjson codec."""
+    import orjson  # pylint: disable=import-outside-toplevel,no-name-in-module
+
+    return JSONCodec("orjson", orjson.dumps, orjson.loads)
+
+
+CODECS: Dict[str, Callable[[], JSONCodec]] = {
+    "orjson": _get_orjson_codec,
+    "msgspec": _get_msgspec_codec,
+    "json": _get_json_codec,
+}
+
+
+def get_codec(name: Optional[str] = None) -> JSONCodec:
+    """Get a codec by name (or, by default, the fastest one that is installed).
+
+    Raises ValueError for unknown names and ImportError if the requested codec's
+    library isn't installed.
+    """
+    if name is not None:
+        if name not in CODECS:
+            raise ValueError(f"Unknown JSON codec: {name}")
+        return CODECS[name]()
+
+    for get in CODECS.values():
+        try:
+            return get()
+        except ImportError:
+            continue
+    return _get_json_codec()
+
+
+DEFAULT_CODEC: JSONCodec = get_codec()
@@ -0,0 +1,548 @@
+"""Define a local stand-in for the 17track.net API (for load and soak testing)."""
+import argparse
+import asyncio
+from collections import Counter, deque
+from datetime import datetime, timedelta
+import json
+import random
+import secrets
+import socket
+import time
+from typing import Callable, Deque, Dict, List, Optional
+
+from aiohttp import ClientRequest, ClientSession, TCPConnector, web
+from aiohttp.abc import AbstractResolver
+import attr
+
+from .package import COUNTRY_MAP, PACKAGE_STATUS_MAP, PACKAGE_TYPE_MAP
+
+SESSION_COOKIE: str = "Last-Event-ID"
+
+CODE_AUTH_FAILURE: int = -6
+CODE_EXISTING_NUMBER: int = -11010101
+CODE_NOT_FOUND: int = -100
+
+CITIES: List[str] = ["Paris", "Madrid", "Berlin", "Milano", "Chicago", "", "Tokyo"]
+EVENTS: List[str] = [
+    "Departure",
+    "Arrival at Destination Post",
+    "Sorted",
+    "Out for delivery",
+    "Delivered",
+    "Ready for pickup",
+]
+
+Latency = Callable[[random.Random], float]
+
+
+def constant(seconds: float) -> Latency:
+    """Return a latency distribution that always takes the same time."""
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    """Return a latency distribution that is uniform between two bounds."""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> Latency:
+    """Return a (long-tailed) log-normal latency distribution."""
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+def synthetic_rows(count: int, *, seed: int = 17, first_id: int = 0) -> List[dict]:
+    """Generate raw package list (GetTrackInfoList) rows."""
+    rng = random.Random(seed)
+    countries = list(COUNTRY_MAP)
+    statuses = list(PACKAGE_STATUS_MAP)
+    package_types = list(PACKAGE_TYPE_MAP)
+    start = datetime(2021, 1, 1)
+
+    rows = []
+    for idx in range(first_id, first_id + count):
+        event_time = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 365))
+        event = {
+            "a": event_time.strftime(
+                "%Y-%m-%d %H:%M" if rng.random() < 0.8 else "%Y-%m-%d %H:%M:%S"
+            ),
+            "b": None,
+            "c": rng.choice(CITIES),
+            "d": COUNTRY_MAP[rng.choice(countries)] if rng.random() < 0.5 else "",
+            "z": rng.choice(EVENTS),
+        }
+        rows.append(
+            {
+                "FTrackInfoId": str(100000000000000000 + idx),
+                "FTrackNo": f"LP{idx:014d}",
+                "FFirstCarrier": 0,
+                "FFirstCarrierSource": 2,
+                "FSecondCarrier": 0,
+                "FSecondCarrierSource": 2,
+                "FLastEvent": json.dumps(event) if rng.random() < 0.95 else None,
+                "FIsArchived": False,
+                "FRemark": f"Package {idx}",
+                "FTrackStateType": rng.choice(package_types),
+                "FCreateTime": start.strftime("%Y-%m-%d %H:%M:%S"),
+                "FPackageState": rng.choice(statuses),
+                "FFirstCountry": rng.choice(countries),
+                "FSecondCountry": rng.choice(countries),
+            }
+        )
+    return rows
+
+
+def packages_response(rows: List[dict], page: int = 1, per_page: int = 0) -> dict:
+    """Return a package list (GetTrackInfoList) response for a page of rows."""
+    per_page = per_page or len(rows) or 1
+    start = (page - 1) * per_page
+    return {
+        "pageInfo": {"Page": page, "PerPage": per_page, "TotalCount": len(rows)},
+        "Json": rows[start : start + per_page],
+        "Code": 0,
+    }
+
+
+def summary_response(rows: List[dict]) -> dict:
+    """Return a summary (GetIndexData) response for a set of rows."""
+    counts: Dict[int, int] = {status: 0 for status in PACKAGE_STATUS_MAP}
+    for row in rows:
+        counts[row["FPackageState"]] = counts.get(row["FPackageState"], 0) + 1
+    return {
+        "Json": {"eitem": [{"e": code, "ec": count} for code, count in counts.items()]},
+        "Code": 0,
+    }
+
+
+def track_response(rows: List[dict]) -> dict:
+    """Return a tracking API (restapi/track) response for a set of rows."""
+    dat = []
+    for row in rows:
+        event = json.loads(row["FLastEvent"]) if row.get("FLastEvent") else {}
+        dat.append(
+            {
+                "no": row["FTrackNo"],
+                "track": {
+                    "b": row.get("FFirstCountry", 0),
+                    "c": row.get("FSecondCountry", 0),
+                    "d": row.get("FTrackStateType", 0),
+                    "e": row.get("FPackageState", 0),
+                    "ln1": "en",
+                    "z0": {
+                        "a": event.get("a"),
+                        "c": event.get("c", ""),
+                        "z": event.get("z"),
+                    },
+                },
+            }
+        )
+    return {"dat": dat}
+
+
+@attr.s
+class EmulatorConfig:
+    """Define the emulator's latency and fault injection settings.
+
+    error_rate and throttle_rate are the fractions of requests that fail with a 5xx
+    or a 429 response; requests_per_second additionally throttles each session once
+    it makes more requests than that within a second. Sessions expire (and requests
+    receive the auth failure code) session_ttl seconds after logging in.
+    """
+
+    latency: Latency = attr.ib(default=constant(0))
+    error_rate: float = attr.ib(default=0.0)
+    throttle_rate: float = attr.ib(default=0.0)
+    requests_per_second: Optional[float] = attr.ib(default=None)
+    session_ttl: Optional[float] = attr.ib(default=None)
+
+
+@attr.s
+class EmulatorStats:
+    """Define counts of what the emulator has served."""
+
+    requests: int = attr.ib(default=0)
+    errors: int = attr.ib(default=0)
+    throttled: int = attr.ib(default=0)
+    expired: int = attr.ib(default=0)
+    methods: Counter = attr.ib(factory=Counter)
+
+
+@attr.s
+class EmulatedAccount:
+    """Define an emulated account."""
+
+    email: str = attr.ib()
+    password: str = attr.ib()
+    account_id: str = attr.ib()
+    rows: List[dict] = attr.ib(factory=list)
+
+
+@attr.s
+class _Session:
+    """Define a logged-in session."""
+
+    account: EmulatedAccount = attr.ib()
+    created_at: float = attr.ib()
+    requests: Deque[float] = attr.ib(factory=deque)
+
+
+class LocalResolver(AbstractResolver):
+    """Define a resolver that sends every host to a local port."""
+
+    def __init__(self, port: int) -> None:
+        """Initialize."""
+        self._port: int = port
+
+    async def resolve(
+        self, host: str, port: int = 0, family: int = socket.AF_INET
+    ) -> List[Dict]:
+        """Resolve a host to the local port."""
+        return [
+            {
+                "hostname": host,
+                "host": "127.0.0.1",
+                "port": self._port,
+                "family": socket.AF_INET,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+        ]
+
+    async def close(self) -> None:
+        """Close the resolver."""
+
+
+class PlainRequest(ClientRequest):
+    """Define a request that is sent without TLS (even for https:// URLs)."""
+
+    def is_ssl(self) -> bool:
+        """Return that the request isn't encrypted."""
+        return False
+
+
+class Emulator:  # pylint: disable=too-many-instance-attributes
+    """Define a local aiohttp server that emulates the 17track.net API.
+
+    The user (userapi/call), buyer (orderapi/call) and tracking (restapi/track) APIs
+    are served from synthetic accounts. Clients reach it through session(), which
+    keeps the real https:// URLs (and, therefore, cookie domains) but sends every
+    request to the emulator without TLS.
+    """
+
+    def __init__(
+        self,
+        config: Optional[EmulatorConfig] = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Initialize."""
+        self._host: str = host
+        self._next_id: int = 0
+        self._rng: random.Random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+        self._sessions: Dict[str, _Session] = {}
+        self.accounts: Dict[str, EmulatedAccount] = {}
+        self.config: EmulatorConfig = config or EmulatorConfig()
+        self.port: int = port
+        self.stats: EmulatorStats = EmulatorStats()
+
+    async def __aenter__(self) -> "Emulator":
+        """Start the emulator."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Stop the emulator."""
+        await self.close()
+
+    def add_account(
+        self,
+        email: str,
+        password: str,
+        *,
+        packages: int = 0,
+        rows: Optional[List[dict]] = None,
+    ) -> EmulatedAccount:
+        """Add an account with synthetic (or provided) package list rows."""
+        if rows is None:
+            rows = synthetic_rows(
+                packages, seed=self._rng.randrange(2**32), first_id=self._next_id
+            )
+        self._next_id += len(rows)
+
+        account = EmulatedAccount(
+            email, password, str(1234567890987654321 + len(self.accounts)), rows
+        )
+        self.accounts[email] = account
+        return account
+
+    def expire_sessions(self) -> None:
+        """Expire every session (so that clients need to log in again)."""
+        self._sessions.clear()
+
+    def session(self) -> ClientSession:
+        """Create a session whose requests (to any host) are sent to the emulator."""
+        return ClientSession(
+            connector=TCPConnector(resolver=LocalResolver(self.port)),
+            request_class=PlainRequest,
+        )
+
+    def _app(self) -> web.Application:
+        """Create the web application."""
+        app = web.Application(client_max_size=0)
+        app.router.add_post("/userapi/call", self._user_handler)
+        app.router.add_post("/orderapi/call", self._buyer_handler)
+        app.router.add_post("/restapi/track", self._track_handler)
+        return app
+
+    async def start(self) -> None:
+        """Start the server (on a free port, unless one was given)."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self._host, self.port))
+        self.port = sock.getsockname()[1]
+
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+
+    async def close(self) -> None:
+        """Stop the server."""
+        if self._runner:
+            await self._runner.cleanup()
+        self._runner = None
+
+    async def _inject_faults(
+        self, request: web.Request, method: str
+    ) -> Optional[web.Response]:
+        """Apply latency and return an injected failure response (if any)."""
+        self.stats.requests += 1
+        self.stats.methods[method] += 1
+
+        latency = self.config.latency(self._rng)
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        if self._rng.random() < self.config.throttle_rate or self._over_rate_limit(
+            request
+        ):
+            self.stats.throttled += 1
+            return web.Response(status=429, text="Too Many Requests")
+
+        if self._rng.random() < self.config.error_rate:
+            self.stats.errors += 1
+            return web.Response(status=self._rng.choice([500, 502, 503, 504]))
+
+        return None
+
+    def _over_rate_limit(self, request: web.Request) -> bool:
+        """Return whether a session has made too many requests in the last second."""
+        if not self.config.requests_per_second:
+            return False
+
+        session = self._sessions.get(request.cookies.get(SESSION_COOKIE, ""))
+        if session is None:
+            return False
+
+        now = time.monotonic()
+        while session.requests and now - session.requests[0] >= 1:
+            session.requests.popleft()
+        if len(session.requests) >= self.config.requests_per_second:
+            return True
+        session.requests.append(now)
+        return False
+
+    def _get_session(self, request: web.Request) -> Optional[_Session]:
+        """Get the (unexpired) session of a request."""
+        token = request.cookies.get(SESSION_COOKIE, "")
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+
+        ttl = self.config.session_ttl
+        if ttl is not None and time.monotonic() - session.created_at > ttl:
+            del self._sessions[token]
+            return None
+        return session
+
+    async def _user_handler(self, request: web.Request) -> web.Response:
+        """Respond to the user API (logging in)."""
+        payload = await request.json()
+        failure = await self._inject_faults(request, payload.get("method", ""))
+        if failure:
+            return failure
+
+        params = payload.get("param", {})
+        account = self.accounts.get(params.get("Email"))
+        if account is None or account.password != params.get("Password"):
+            return web.json_response(
+                {"Code": CODE_AUTH_FAILURE, "Message": "Invalid credentials."}
+            )
+
+        token = secrets.token_hex(16)
+        self._sessions[token] = _Session(account, time.monotonic())
+        response = web.json_response(
+            {"Json": {"gid": account.account_id, "FEmail": account.email}, "Code": 0}
+        )
+        response.set_cookie(SESSION_COOKIE, token, domain=".17track.net", path="/")
+        return response
+
+    async def _buyer_handler(self, request: web.Request) -> web.Response:
+        """Respond to the buyer API."""
+        payload = await request.json()
+        method = payload.get("method", "")
+        failure = await self._inject_faults(request, method)
+        if failure:
+            return failure
+
+        session = self._get_session(request)
+        if session is None:
+            self.stats.expired += 1
+            return web.json_response(
+                {
+                    "Code": CODE_AUTH_FAILURE,
+                    "Message": "You haven't logged in for a long time.",
+                }
+            )
+
+        params = payload.get("param", {})
+        handlers = {
+            "AddTrackNo": self._add_track_numbers,
+            "GetIndexData": self._get_index_data,
+            "GetTrackInfoList": self._get_track_info_list,
+            "SetTrackRemark": self._set_track_remark,
+        }
+        if method not in handlers:
+            return web.json_response({"Code": CODE_NOT_FOUND, "Message": method})
+        return web.json_response(handlers[method](session.account, params))
+
+    @staticmethod
+    def _get_index_data(account: EmulatedAccount, params: dict) -> dict:
+        """Summarize an account's packages."""
+        archived = params.get("IsArchived", False)
+        return summary_response(
+            [row for row in account.rows if row["FIsArchived"] == archived]
+        )
+
+    @staticmethod
+    def _get_track_info_list(account: EmulatedAccount, params: dict) -> dict:
+        """List a page of an account's (filtered) packages."""
+        archived = params.get("IsArchived", False)
+        state = params.get("PackageState", "")
+        item = params.get("Item", "")
+        rows = [
+            row
+            for row in account.rows
+            if row["FIsArchived"] == archived
+            and state in ("", row["FPackageState"])
+            and (not item or item in row["FTrackNo"] + (row["FRemark"] or ""))
+        ]
+        return packages_response(rows, params.get("Page", 1), params.get("PerPage", 0))
+
+    def _add_track_numbers(self, account: EmulatedAccount, params: dict) -> dict:
+        """Add tracking numbers to an account."""
+        existing = {row["FTrackNo"] for row in account.rows}
+        items = []
+        for number in params.get("TrackNos", []):
+            if number in existing:
+                items.append(
+                    {
+                        "TrackInfoId": "0",
+                        "TrackNo": number,
+                        "ResultCode": CODE_EXISTING_NUMBER,
+                    }
+                )
+                continue
+
+            row = synthetic_rows(1, first_id=self._next_id)[0]
+            self._next_id += 1
+            row.update(FTrackNo=number, FRemark=None, FLastEvent=None, FPackageState=0)
+            account.rows.append(row)
+            existing.add(number)
+            items.append(
+                {"TrackInfoId": row["FTrackInfoId"], "TrackNo": number, "ResultCode": 0}
+            )
+
+        errors = sum(1 for item in items if item["ResultCode"] != 0)
+        return {
+            "Json": {
+                "Items": items,
+                "SuccessNum": len(items) - errors,
+                "ErrorNum": errors,
+            },
+            "Code": 0 if not errors else CODE_EXISTING_NUMBER,
+        }
+
+    @staticmethod
+    def _set_track_remark(account: EmulatedAccount, params: dict) -> dict:
+        """Set the friendly name of a package."""
+        for row in account.rows:
+            if row["FTrackInfoId"] == params.get("TrackInfoId"):
+                row["FRemark"] = params.get("Remark")
+                return {"Json": {}, "Code": 0}
+        return {"Json": {}, "Code": CODE_NOT_FOUND}
+
+    async def _track_handler(self, request: web.Request) -> web.Response:
+        """Respond to the tracking API."""
+        payload = await request.json()
+        failure = await self._inject_faults(request, "track")
+        if failure:
+            return failure
+
+        rows = {
+            row["FTrackNo"]: row
+            for account in self.accounts.values()
+            for row in account.rows
+        }
+        numbers = [item["num"] for item in payload.get("data", [])]
+        dat = track_response([rows[num] for num in numbers if num in rows])["dat"]
+        dat.extend({"no": num, "track": None} for num in numbers if num not in rows)
+        return web.json_response({"dat": dat})
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the emulator until cancelled."""
+    emulator = Emulator(
+        EmulatorConfig(
+            latency=lognormal(args.latency) if args.latency else constant(0),
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            requests_per_second=args.requests_per_second,
+            session_ttl=args.session_ttl,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    for idx in range(args.accounts):
+        emulator.add_account(f"user{idx}@email.com", "password", packages=args.packages)
+
+    async with emulator:
+        print(
+            f"Emulating 17track.net on {args.host}:{emulator.port} "
+            f"({args.accounts} accounts; password: 'password')"
+        )
+        await asyncio.Event().wait()
+
+
+def main() -> None:
+    """Parse arguments and run the emulator."""
+    parser = argparse.ArgumentParser(prog="python -m py17track.emulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8017)
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--packages", type=int, default=100)
+    parser.add_argument("--latency", type=float, help="median latency (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-second", type=float)
+    parser.add_argument("--session-ttl", type=float)
+
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
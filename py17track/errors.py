@@ -17,3 +17,9 @@ class RequestError(SeventeenTrackError):
     """Define an error for HTTP request errors."""
 
     pass
+
+
+class CircuitOpenError(RequestError):
+    """Define an error for requests rejected by an open circuit breaker."""
+
+    pass
@@ -0,0 +1,131 @@
+"""Define streaming exports of an account's packages."""
+import asyncio
+import csv
+import gzip
+import io
+import os
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .codec import JSONCodec
+from .package import LazyPackage, Package
+from .profile import DEFAULT_PAGE_SIZE, Profile
+
+EXPORT_FIELDS: Tuple[str, ...] = (
+    "tracking_number",
+    "id",
+    "friendly_name",
+    "status",
+    "package_type",
+    "origin_country",
+    "destination_country",
+    "info_text",
+    "location",
+    "timestamp",
+    "tracking_info_language",
+)
+
+FORMAT_CSV: str = "csv"
+FORMAT_NDJSON: str = "ndjson"
+
+
+def package_record(package: Union[LazyPackage, Package]) -> Dict[str, Any]:
+    """Return the exported fields of a package (with an ISO 8601 timestamp)."""
+    record = {field: getattr(package, field) for field in EXPORT_FIELDS}
+    if record["timestamp"] is not None:
+        record["timestamp"] = record["timestamp"].isoformat()
+    return record
+
+
+def _encode_ndjson(records: List[Dict[str, Any]], codec: JSONCodec) -> bytes:
+    """Encode records as newline-delimited JSON."""
+    return b"".join(codec.dumps(record) + b"\n" for record in records)
+
+
+def _encode_csv(records: List[Dict[str, Any]], header: bool) -> bytes:
+    """Encode records as CSV (optionally, preceded by the header)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue().encode()
+
+
+async def export_packages(  # pylint: disable=too-many-arguments,too-many-locals
+    profile: Profile,
+    destination: Union[str, os.PathLike, IO],
+    *,
+    export_format: str = FORMAT_NDJSON,
+    compress: Optional[bool] = None,
+    package_state: Union[int, str] = "",
+    show_archived: bool = False,
+    tz: str = "UTC",
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> int:
+    """Export every package in an account as NDJSON or CSV (returning the count).
+
+    destination is a path or a writable (binary or text) stream. Pages are requested
+    one at a time and each is written (in a worker thread) as soon as it has been
+    fetched, so memory use is bounded by the page size rather than the account size.
+    Output is gzip-compressed if compress is True (by default, only for paths ending
+    in ".gz", and only binary streams can be compressed); streams are left open.
+    """
+    if export_format not in (FORMAT_CSV, FORMAT_NDJSON):
+        raise ValueError(f"Unknown export format: {export_format}")
+
+    is_path = isinstance(destination, (str, os.PathLike))
+    if compress is None:
+        compress = is_path and os.fspath(destination).endswith(".gz")  # type: ignore
+
+    stream: IO
+    if is_path:
+        stream = await asyncio.to_thread(open, destination, "wb")  # type: ignore
+    else:
+        stream = destination  # type: ignore
+    compressed: Optional[gzip.GzipFile] = None
+    if compress:
+        compressed = gzip.GzipFile(fileobj=stream, mode="wb")  # type: ignore
+
+    write: Callable[[bytes], Any]
+    if compressed is not None:
+        write = compressed.write
+    elif isinstance(stream, io.TextIOBase):
+        write = lambda chunk: stream.write(chunk.decode())  # noqa: E731
+    else:
+        write = stream.write
+
+    count = 0
+    pages_written = 0
+
+    async def flush(records: List[Dict[str, Any]]) -> None:
+        """Encode and write a page of records."""
+        nonlocal pages_written
+        if export_format == FORMAT_CSV:
+            chunk = _encode_csv(records, header=pages_written == 0)
+        else:
+            chunk = _encode_ndjson(records, profile.codec)
+        await asyncio.to_thread(write, chunk)
+        pages_written += 1
+
+    try:
+        records: List[Dict[str, Any]] = []
+        async for package in profile.iter_packages(
+            package_state, show_archived, tz, page_size=page_size
+        ):
+            records.append(package_record(package))
+            count += 1
+            if len(records) >= page_size:
+                await flush(records)
+                records = []
+
+        if records or (count == 0 and export_format == FORMAT_CSV):
+            await flush(records)
+    finally:
+        if compressed is not None:
+            await asyncio.to_thread(compressed.close)
+        if is_path:
+            await asyncio.to_thread(stream.close)
+        else:
+            await asyncio.to_thread(stream.flush)
+
+    return count
@@ -0,0 +1,158 @@
+"""Define a manager for polling many 17track.net accounts."""
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiohttp import TCPConnector
+import attr
+
+from .client import DEFAULT_CONNECTION_LIMIT, Client
+from .errors import SeventeenTrackError
+
+DEFAULT_MAX_CONCURRENT_REQUESTS: int = 50
+DEFAULT_MAX_CONCURRENT_REQUESTS_PER_ACCOUNT: int = 2
+
+
+@attr.s(frozen=True)
+class FleetResult:
+    """Define the aggregate result of running an operation against every account."""
+
+    results: Dict[str, Any] = attr.ib(factory=dict)
+    failures: Dict[str, BaseException] = attr.ib(factory=dict)
+
+
+@attr.s(frozen=True)
+class _Account:
+    """Define the credentials (and client) of a single account."""
+
+    email: str = attr.ib()
+    password: str = attr.ib()
+    client: Client = attr.ib()
+
+
+async def _get_packages(client: Client) -> list:
+    """Get every package associated with an account."""
+    return await client.profile.packages(fetch_all=True)
+
+
+async def _login(account: _Account) -> bool:
+    """Log in to a single account."""
+    return await account.client.profile.login(account.email, account.password)
+
+
+async def _run_operation(
+    operation: Callable[[Client], Awaitable[Any]], account: _Account
+) -> Any:
+    """Run an operation against a single account (logging in first, if needed)."""
+    if not account.client.profile.account_id and not await _login(account):
+        raise SeventeenTrackError("Login failed")
+    return await operation(account.client)
+
+
+class Fleet:
+    """Define a manager for many accounts that share a single connection pool.
+
+    Each account gets its own client (and, therefore, its own cookies); requests are
+    limited both globally and per account. Since waiters for the global limit are
+    served in FIFO order and no account can hold more than its own share of it, busy
+    accounts can't starve the others.
+    """
+
+    def __init__(
+        self,
+        *,
+        connection_limit: int = DEFAULT_CONNECTION_LIMIT,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        max_concurrent_requests_per_account: int = (
+            DEFAULT_MAX_CONCURRENT_REQUESTS_PER_ACCOUNT
+        ),
+        **client_kwargs: Any,
+    ) -> None:
+        """Initialize.
+
+        Any extra keyword arguments are passed to every account's Client.
+        """
+        self._accounts: Dict[str, _Account] = {}
+        self._client_kwargs: Dict[str, Any] = client_kwargs
+        self._connection_limit: int = connection_limit
+        self._connector: Optional[TCPConnector] = None
+        self._max_concurrent_requests: int = max_concurrent_requests
+        self._max_concurrent_requests_per_account: int = (
+            max_concurrent_requests_per_account
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "Fleet":
+        """Enter the fleet's runtime context."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Exit the fleet's runtime context (closing every connection)."""
+        await self.close()
+
+    @property
+    def clients(self) -> Dict[str, Client]:
+        """Return the client of every account (by account key)."""
+        return {key: account.client for key, account in self._accounts.items()}
+
+    def add_account(
+        self, email: str, password: str, *, key: Optional[str] = None
+    ) -> Client:
+        """Add an account (by default, keyed by its email address) to the fleet.
+
+        This should be called from a coroutine, since it may create the shared pool.
+        Raises ValueError if an account with the same key was already added.
+        """
+        key = key or email
+        if key in self._accounts:
+            raise ValueError(f"An account has already been added as {key}")
+
+        if self._connector is None or self._connector.closed:
+            self._connector = TCPConnector(limit=self._connection_limit)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+
+        client = Client(
+            connector=self._connector,
+            max_concurrent_requests=self._max_concurrent_requests_per_account,
+            request_semaphore=self._semaphore,
+            **self._client_kwargs,
+        )
+        self._accounts[key] = _Account(email, password, client)
+        return client
+
+    async def close(self) -> None:
+        """Close every account's session and the shared connection pool."""
+        await asyncio.gather(
+            *(account.client.close() for account in self._accounts.values())
+        )
+        if self._connector:
+            await self._connector.close()
+        self._connector = None
+
+    async def login(self) -> FleetResult:
+        """Log in to every account (returning whether each login succeeded)."""
+        return await self._run(_login)
+
+    async def run(self, operation: Callable[[Client], Awaitable[Any]]) -> FleetResult:
+        """Run an operation against every account (logging in first, if needed)."""
+        return await self._run(partial(_run_operation, operation))
+
+    async def poll(self) -> FleetResult:
+        """Get every package associated with every account."""
+        return await self.run(_get_packages)
+
+    async def _run(self, coro: Callable[[_Account], Awaitable[Any]]) -> FleetResult:
+        """Run a coroutine against every account, collecting results and failures."""
+        keys = list(self._accounts)
+        outcomes = await asyncio.gather(
+            *(coro(self._accounts[key]) for key in keys), return_exceptions=True
+        )
+
+        result = FleetResult()
+        for key, outcome in zip(keys, outcomes):
+            if isinstance(outcome, BaseException):
+                result.failures[key] = outcome
+            else:
+                result.results[key] = outcome
+        return result
@@ -0,0 +1,192 @@
+"""Define request instrumentation (traces, rolling latency histograms and counters)."""
+import bisect
+from collections import Counter, deque
+import time
+from types import SimpleNamespace
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import ClientSession, TraceConfig, TraceConnectionQueuedEndParams
+import attr
+
+# Upper bounds (in seconds) of the latency histogram buckets; slower requests fall in
+# a final, unbounded bucket:
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+DEFAULT_WINDOW: float = 300.0
+
+
+@attr.s(slots=True)
+class RequestTrace:  # pylint: disable=too-many-instance-attributes
+    """Define the trace of a single request (including any retries).
+
+    latency covers the whole request (from the first attempt until the last response
+    or error); pool_wait is the time spent waiting for a request slot or a pooled
+    connection, and rate_limit_wait the time spent waiting for the rate limiter.
+    status is the final attempt's HTTP status and statuses that of every attempt.
+    """
+
+    api_method: str = attr.ib()
+    url: str = attr.ib()
+    method: str = attr.ib()
+    account_id: Optional[str] = attr.ib(default=None)
+    status: Optional[int] = attr.ib(default=None)
+    latency: float = attr.ib(default=0.0)
+    bytes_received: int = attr.ib(default=0)
+    retries: int = attr.ib(default=0)
+    pool_wait: float = attr.ib(default=0.0)
+    rate_limit_wait: float = attr.ib(default=0.0)
+    error: Optional[Exception] = attr.ib(default=None)
+    statuses: List[int] = attr.ib(factory=list)
+
+
+@attr.s(frozen=True)
+class LatencyHistogram:
+    """Define a latency histogram.
+
+    counts[i] is the number of requests that took at most buckets[i] seconds (and
+    more than buckets[i - 1]); the final count is for requests slower than that.
+    """
+
+    buckets: Tuple[float, ...] = attr.ib()
+    counts: Tuple[int, ...] = attr.ib()
+    total: float = attr.ib()
+
+    @property
+    def count(self) -> int:
+        """Return the number of requests."""
+        return sum(self.counts)
+
+    @property
+    def mean(self) -> float:
+        """Return the mean latency."""
+        return self.total / self.count if self.count else 0.0
+
+
+@attr.s(slots=True)
+class MethodCounters:
+    """Define the (cumulative) counters of a single API method.
+
+    statuses counts the HTTP status of every attempt (including retried ones).
+    """
+
+    requests: int = attr.ib(default=0)
+    errors: int = attr.ib(default=0)
+    retries: int = attr.ib(default=0)
+    bytes_received: int = attr.ib(default=0)
+    pool_wait: float = attr.ib(default=0.0)
+    rate_limit_wait: float = attr.ib(default=0.0)
+    statuses: Counter = attr.ib(factory=Counter)
+
+
+class RequestMetrics:
+    """Define rolling latency histograms and cumulative counters per API method.
+
+    Latencies are kept for the last window seconds; counters are never reset. A single
+    instance can be shared by several clients.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: float = DEFAULT_WINDOW,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initialize."""
+        self._latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.counters: Dict[str, MethodCounters] = {}
+        self.window: float = window
+
+    def record(self, trace: RequestTrace) -> None:
+        """Record a request trace."""
+        counters = self.counters.setdefault(trace.api_method, MethodCounters())
+        counters.requests += 1
+        counters.errors += trace.error is not None
+        counters.retries += trace.retries
+        counters.bytes_received += trace.bytes_received
+        counters.pool_wait += trace.pool_wait
+        counters.rate_limit_wait += trace.rate_limit_wait
+        if trace.statuses:
+            counters.statuses.update(trace.statuses)
+        elif trace.status is not None:
+            counters.statuses[trace.status] += 1
+
+        latencies = self._latencies.setdefault(trace.api_method, deque())
+        latencies.append((time.monotonic(), trace.latency))
+        self._expire(latencies)
+
+    def _expire(self, latencies: Deque[Tuple[float, float]]) -> None:
+        """Drop the latencies that have left the window."""
+        cutoff = time.monotonic() - self.window
+        while latencies and latencies[0][0] < cutoff:
+            latencies.popleft()
+
+    def _window_latencies(self, api_method: Optional[str]) -> List[float]:
+        """Return the latencies (of one or every API method) within the window."""
+        methods = [api_method] if api_method else list(self._latencies)
+        latencies: List[float] = []
+        for method in methods:
+            samples = self._latencies.get(method, deque())
+            self._expire(samples)
+            latencies.extend(latency for _, latency in samples)
+        return latencies
+
+    def histogram(self, api_method: Optional[str] = None) -> LatencyHistogram:
+        """Return the latency histogram of an API method (or of every method)."""
+        counts = [0] * (len(self.buckets) + 1)
+        latencies = self._window_latencies(api_method)
+        for latency in latencies:
+            counts[bisect.bisect_left(self.buckets, latency)] += 1
+        return LatencyHistogram(self.buckets, tuple(counts), sum(latencies))
+
+    def percentile(self, percent: float, api_method: Optional[str] = None) -> float:
+        """Return a latency percentile over the window.
+
+        percent is the percentage (e.g., 95) of requests at least as fast as the result.
+        """
+        latencies = sorted(self._window_latencies(api_method))
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+        return latencies[index]
+
+
+async def _on_connection_queued_end(
+    session: ClientSession,
+    context: SimpleNamespace,
+    params: TraceConnectionQueuedEndParams,
+) -> None:
+    """Add the time spent waiting for a pooled connection to the request's trace."""
+    trace = context.trace_request_ctx
+    if isinstance(trace, RequestTrace):
+        trace.pool_wait += time.monotonic() - context.queued_at
+
+
+async def _on_connection_queued_start(
+    session: ClientSession, context: SimpleNamespace, params: object
+) -> None:
+    """Note when a request started waiting for a pooled connection."""
+    context.queued_at = time.monotonic()
+
+
+def trace_config() -> TraceConfig:
+    """Return an aiohttp trace config that measures connection pool waits.
+
+    Sessions created by the client use it automatically; add it to the trace_configs
+    of a session passed to the client to include pool waits in its traces.
+    """
+    config = TraceConfig()
+    config.on_connection_queued_start.append(_on_connection_queued_start)
+    config.on_connection_queued_end.append(_on_connection_queued_end)
+    return config
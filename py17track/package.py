@@ -1,10 +1,14 @@
 """Define a simple structure for a package."""
-from datetime import datetime
-from typing import Dict, Optional
+from datetime import datetime, timedelta
+from functools import cached_property
+import re
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
 
 import attr
 from pytz import UTC, timezone
 
+from .codec import DEFAULT_CODEC, JSONCodec
+
 COUNTRY_MAP: Dict[int, str] = {
     0: "Unknown",
     102: "Afghanistan",
@@ -247,6 +251,18 @@ PACKAGE_STATUS_MAP: Dict[int, str] = {
     50: "Returned",
 }
 
+PACKAGE_STATUS_NAMES: Dict[str, int] = {
+    name: code for code, name in PACKAGE_STATUS_MAP.items()
+}
+
+# Matches both timestamp formats used by 17track.net ("%Y-%m-%d %H:%M" and
+# "%Y-%m-%d %H:%M:%S"):
+TIMESTAMP_PATTERN: Pattern = re.compile(
+    r"(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?"
+)
+
+EPOCH: datetime = datetime(1970, 1, 1, tzinfo=UTC)
+
 PACKAGE_TYPE_MAP: Dict[int, str] = {
     0: "Unknown",
     1: "Small Registered Package",
@@ -286,20 +302,368 @@ class Package:
         )
 
         if self.timestamp is not None:
-            tz = timezone(self.tz)
-            try:
-                timestamp = tz.localize(
-                    datetime.strptime(self.timestamp, "%Y-%m-%d %H:%M")
+            object.__setattr__(
+                self, "timestamp", parse_timestamp(self.timestamp, self.tz)
+            )
+
+    @classmethod
+    def _from_fields(cls, **fields: Any) -> "Package":
+        """Create a package from already-mapped fields (skipping post-init).
+
+        This bypasses __init__ (and so relies on Package having no slots, converters or
+        validators); the bulk constructors' tests check the result against Package().
+        """
+        package = cls.__new__(cls)
+        package.__dict__.update(fields)
+        return package
+
+    @classmethod
+    def from_profile_rows(
+        cls, rows: Iterable[dict], tz: str = "UTC", codec: JSONCodec = DEFAULT_CODEC
+    ) -> List["Package"]:
+        """Create packages from raw package list (GetTrackInfoList) rows.
+
+        This is equivalent to (but much faster than) creating each Package directly.
+        """
+        parse = TimestampParser(tz)
+        packages: List[Package] = []
+
+        for row in rows:
+            event: dict = {}
+            last_event_raw: Optional[str] = row.get("FLastEvent")
+            if last_event_raw:
+                event = codec.loads(last_event_raw)
+            value: Optional[str] = event.get("a")
+
+            packages.append(
+                cls._from_fields(
+                    tracking_number=row["FTrackNo"],
+                    destination_country=COUNTRY_MAP[row.get("FSecondCountry", 0)],
+                    id=row.get("FTrackInfoId"),
+                    friendly_name=row.get("FRemark"),
+                    info_text=event.get("z"),
+                    location=" ".join([event.get("c", ""), event.get("d", "")]).strip(),
+                    timestamp=None if value is None else parse(value),
+                    origin_country=COUNTRY_MAP[row.get("FFirstCountry", 0)],
+                    package_type=PACKAGE_TYPE_MAP[row.get("FTrackStateType", 0)],
+                    status=PACKAGE_STATUS_MAP.get(
+                        row.get("FPackageState", 0), "Unknown"
+                    ),
+                    tracking_info_language="Unknown",
+                    tz=tz,
+                )
+            )
+        return packages
+
+    @classmethod
+    def from_track_rows(cls, rows: Iterable[dict], tz: str = "UTC") -> List["Package"]:
+        """Create packages from tracking API rows (the "dat" items of a response).
+
+        Rows without tracking info are skipped.
+        """
+        parse = TimestampParser(tz)
+        packages: List[Package] = []
+
+        for row in rows:
+            info: dict = row.get("track") or {}
+            if not info:
+                continue
+            event: dict = info.get("z0") or {}
+            value: Optional[str] = event.get("a")
+
+            packages.append(
+                cls._from_fields(
+                    tracking_number=row["no"],
+                    destination_country=COUNTRY_MAP[info.get("c", 0)],
+                    id=None,
+                    friendly_name=None,
+                    info_text=event.get("z"),
+                    location=event.get("c"),
+                    timestamp=None if value is None else parse(value),
+                    origin_country=COUNTRY_MAP[info.get("b", 0)],
+                    package_type=PACKAGE_TYPE_MAP[info.get("d", 0)],
+                    status=PACKAGE_STATUS_MAP.get(info.get("e", 0), "Unknown"),
+                    tracking_info_language=info.get("ln1", "Unknown"),
+                    tz=tz,
                 )
-            except ValueError:
-                try:
-                    timestamp = tz.localize(
-                        datetime.strptime(self.timestamp, "%Y-%m-%d %H:%M:%S")
-                    )
-                except ValueError:
-                    timestamp = datetime(1970, 1, 1, tzinfo=UTC)
-
-            if self.tz != "UTC":
-                timestamp = timestamp.astimezone(UTC)
-
-            object.__setattr__(self, "timestamp", timestamp)
+            )
+        return packages
+
+
+def parse_timestamp(value: str, tz: str = "UTC") -> datetime:
+    """Parse a 17track.net timestamp (in the tz timezone) into a UTC datetime."""
+    return TimestampParser(tz).parse(value)
+
+
+class TimestampParser:
+    """Define a parser for 17track.net timestamps in a single timezone.
+
+    The timezone is resolved once, the format is detected with a regular expression
+    (rather than by trying each strptime format in turn) and results are memoized, so
+    that parsing the many repeated timestamps in a package list is cheap. The UTC
+    offset of a fixed-offset timezone is only looked up once; otherwise, it's cached
+    per local date and hour (unless it changes within that hour).
+    """
+
+    def __init__(self, tz: str = "UTC") -> None:
+        """Initialize."""
+        self._cache: Dict[str, datetime] = {}
+        self._offsets: Dict[Tuple[int, int, int, int], Optional[timedelta]] = {}
+        self._tzinfo = timezone(tz)
+        # Only fixed-offset timezones (like UTC) have an offset regardless of the date:
+        self._fixed_offset: Optional[timedelta] = self._tzinfo.utcoffset(None)
+        self.tz: str = tz
+
+    def __call__(self, value: str) -> datetime:
+        """Parse a timestamp (returning a memoized result if possible)."""
+        timestamp = self._cache.get(value)
+        if timestamp is None:
+            timestamp = self._cache[value] = self.parse(value)
+        return timestamp
+
+    def parse(self, value: str) -> datetime:
+        """Parse a timestamp into a UTC datetime (or the epoch if it is invalid)."""
+        match = TIMESTAMP_PATTERN.fullmatch(value)
+        if not match:
+            return EPOCH
+
+        try:
+            # The seconds group is None for "%Y-%m-%d %H:%M" values:
+            local = datetime(*map(int, filter(None, match.groups())))
+        except ValueError:
+            # The value has the right format, but isn't a valid date/time:
+            return EPOCH
+
+        offset = self._fixed_offset
+        if offset is None:
+            offset = self._hour_offset(local)
+        if offset is None:
+            return self._tzinfo.localize(local).astimezone(UTC)
+        if not offset:
+            return local.replace(tzinfo=UTC)
+        return (local - offset).replace(tzinfo=UTC)
+
+    def _hour_offset(self, local: datetime) -> Optional[timedelta]:
+        """Get the UTC offset for a local date and hour (None if it changes in it)."""
+        key = (local.year, local.month, local.day, local.hour)
+        try:
+            return self._offsets[key]
+        except KeyError:
+            pass
+
+        start = local.replace(minute=0, second=0, microsecond=0)
+        offset = self._tzinfo.localize(start).utcoffset()
+        end = start.replace(minute=59, second=59, microsecond=999999)
+        if self._tzinfo.localize(end).utcoffset() != offset:
+            offset = None
+        self._offsets[key] = offset
+        return offset
+
+
+class LazyPackage:  # pylint: disable=too-many-instance-attributes
+    """Define a package that decodes a raw package list row on first access.
+
+    Only tracking_number, id and friendly_name are read directly from the row; every
+    other field is decoded the first time it is accessed and cached afterward.
+    """
+
+    def __init__(
+        self, row: dict, tz: str = "UTC", codec: JSONCodec = DEFAULT_CODEC
+    ) -> None:
+        """Initialize."""
+        self.codec: JSONCodec = codec
+        self.row: dict = row
+        self.tz: str = tz
+        self.tracking_info_language: str = "Unknown"
+
+    def __repr__(self) -> str:
+        """Return a string representation."""
+        return f"LazyPackage(tracking_number={self.tracking_number!r}, id={self.id!r})"
+
+    @property
+    def tracking_number(self) -> str:
+        """Return the tracking number."""
+        return self.row["FTrackNo"]
+
+    @property
+    def id(self) -> Optional[str]:  # pylint: disable=invalid-name
+        """Return the internal 17track.net ID."""
+        return self.row.get("FTrackInfoId")
+
+    @property
+    def friendly_name(self) -> Optional[str]:
+        """Return the friendly name."""
+        return self.row.get("FRemark")
+
+    @cached_property
+    def destination_country(self) -> str:
+        """Return the destination country."""
+        return COUNTRY_MAP[self.row.get("FSecondCountry", 0)]
+
+    @cached_property
+    def origin_country(self) -> str:
+        """Return the origin country."""
+        return COUNTRY_MAP[self.row.get("FFirstCountry", 0)]
+
+    @cached_property
+    def package_type(self) -> str:
+        """Return the package type."""
+        return PACKAGE_TYPE_MAP[self.row.get("FTrackStateType", 0)]
+
+    @cached_property
+    def status(self) -> str:
+        """Return the package status."""
+        return PACKAGE_STATUS_MAP.get(self.row.get("FPackageState", 0), "Unknown")
+
+    @cached_property
+    def event(self) -> dict:
+        """Return the decoded last event."""
+        last_event_raw: Optional[str] = self.row.get("FLastEvent")
+        if not last_event_raw:
+            return {}
+        return self.codec.loads(last_event_raw)
+
+    @property
+    def info_text(self) -> Optional[str]:
+        """Return the text description of the latest event."""
+        return self.event.get("z")
+
+    @cached_property
+    def location(self) -> str:
+        """Return the location of the latest event."""
+        return " ".join([self.event.get("c", ""), self.event.get("d", "")]).strip()
+
+    @cached_property
+    def timestamp(self) -> Optional[datetime]:
+        """Return the timestamp of the latest event."""
+        value: Optional[str] = self.event.get("a")
+        if value is None:
+            return None
+        return parse_timestamp(value, self.tz)
+
+    def to_package(self) -> Package:
+        """Return a fully-decoded Package."""
+        return Package(
+            self.tracking_number,
+            id=self.id,
+            destination_country=self.row.get("FSecondCountry", 0),
+            friendly_name=self.friendly_name,
+            info_text=self.info_text,
+            location=self.location,
+            timestamp=self.event.get("a"),
+            tz=self.tz,
+            origin_country=self.row.get("FFirstCountry", 0),
+            package_type=self.row.get("FTrackStateType", 0),
+            status=self.row.get("FPackageState", 0),
+        )
+
+
+class CompactPackage:  # pylint: disable=too-many-instance-attributes
+    """Define a memory-efficient, __slots__-based package.
+
+    Countries, package type and status are stored as their raw 17track.net codes (and
+    mapped to names on access); the timestamp is stored as an epoch integer.
+    """
+
+    __slots__ = (
+        "tracking_number",
+        "id",
+        "friendly_name",
+        "info_text",
+        "location",
+        "destination_country_code",
+        "origin_country_code",
+        "package_type_code",
+        "status_code",
+        "epoch",
+        "tracking_info_language",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        tracking_number: str,
+        *,
+        id: Optional[str] = None,  # pylint: disable=redefined-builtin
+        friendly_name: Optional[str] = None,
+        info_text: Optional[str] = None,
+        location: str = "",
+        destination_country_code: int = 0,
+        origin_country_code: int = 0,
+        package_type_code: int = 0,
+        status_code: int = 0,
+        epoch: Optional[int] = None,
+        tracking_info_language: str = "Unknown",
+    ) -> None:
+        """Initialize."""
+        self.tracking_number: str = tracking_number
+        self.id: Optional[str] = id  # pylint: disable=invalid-name
+        self.friendly_name: Optional[str] = friendly_name
+        self.info_text: Optional[str] = info_text
+        self.location: str = location
+        self.destination_country_code: int = destination_country_code
+        self.origin_country_code: int = origin_country_code
+        self.package_type_code: int = package_type_code
+        self.status_code: int = status_code
+        self.epoch: Optional[int] = epoch
+        self.tracking_info_language: str = tracking_info_language
+
+    def __repr__(self) -> str:
+        """Return a string representation."""
+        return (
+            f"CompactPackage(tracking_number={self.tracking_number!r}, "
+            f"id={self.id!r}, status={self.status!r})"
+        )
+
+    @classmethod
+    def from_row(
+        cls, row: dict, tz: str = "UTC", codec: JSONCodec = DEFAULT_CODEC
+    ) -> "CompactPackage":
+        """Create a compact package from a raw package list row."""
+        event: dict = {}
+        last_event_raw: Optional[str] = row.get("FLastEvent")
+        if last_event_raw:
+            event = codec.loads(last_event_raw)
+
+        epoch: Optional[int] = None
+        if event.get("a") is not None:
+            epoch = int(parse_timestamp(event["a"], tz).timestamp())
+
+        return cls(
+            row["FTrackNo"],
+            id=row.get("FTrackInfoId"),
+            friendly_name=row.get("FRemark"),
+            info_text=event.get("z"),
+            location=" ".join([event.get("c", ""), event.get("d", "")]).strip(),
+            destination_country_code=row.get("FSecondCountry", 0),
+            origin_country_code=row.get("FFirstCountry", 0),
+            package_type_code=row.get("FTrackStateType", 0),
+            status_code=row.get("FPackageState", 0),
+            epoch=epoch,
+        )
+
+    @property
+    def destination_country(self) -> str:
+        """Return the destination country."""
+        return COUNTRY_MAP[self.destination_country_code]
+
+    @property
+    def origin_country(self) -> str:
+        """Return the origin country."""
+        return COUNTRY_MAP[self.origin_country_code]
+
+    @property
+    def package_type(self) -> str:
+        """Return the package type."""
+        return PACKAGE_TYPE_MAP[self.package_type_code]
+
+    @property
+    def status(self) -> str:
+        """Return the package status."""
+        return PACKAGE_STATUS_MAP.get(self.status_code, "Unknown")
+
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        """Return the timestamp of the latest event (in UTC)."""
+        if self.epoch is None:
+            return None
+        return datetime.fromtimestamp(self.epoch, tz=UTC)
@@ -1,27 +1,118 @@
 """Define interaction with a user profile."""
-import json
+import asyncio
 import logging
-from typing import Callable, Coroutine, List, Optional, Union
+import math
+from typing import (
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from .errors import InvalidTrackingNumberError, RequestError
-from .package import PACKAGE_STATUS_MAP, Package
+import attr
+
+from .batch import PackageBatch
+from .codec import DEFAULT_CODEC, JSONCodec
+from .errors import InvalidTrackingNumberError, RequestError, SeventeenTrackError
+from .package import PACKAGE_STATUS_MAP, PACKAGE_STATUS_NAMES, LazyPackage, Package
 
 _LOGGER: logging.Logger = logging.getLogger(__name__)
 
 API_URL_BUYER: str = "https://buyer.17track.net/orderapi/call"
 API_URL_USER: str = "https://user.17track.net/userapi/call"
 
+# Response codes indicating that the session has expired (and a new login is needed):
+AUTH_FAILURE_CODES: FrozenSet[int] = frozenset({-6})
+
+DEFAULT_ADD_BATCH_SIZE: int = 40
+DEFAULT_MAX_CONCURRENT_PAGES: int = 4
+DEFAULT_MAX_CONCURRENT_REQUESTS: int = 4
+DEFAULT_PAGE_SIZE: int = 40
+
+
+def _normalize_tracking_number(tracking_number: str) -> str:
+    """Normalize a tracking number (as 17track.net does) for comparisons."""
+    return "".join(tracking_number.split()).upper()
+
+
+@attr.s(frozen=True)
+class AddPackagesResult:
+    """Define the result of adding many packages.
+
+    added maps each successfully-added tracking number to its internal ID (which is
+    only resolved if a friendly name was requested for it); failures maps tracking
+    numbers to the error that occurred while adding them or setting their friendly
+    name (so a package can appear in both).
+    """
+
+    added: Dict[str, Optional[str]] = attr.ib(factory=dict)
+    failures: Dict[str, SeventeenTrackError] = attr.ib(factory=dict)
+
 
 class Profile:
     """Define a 17track.net profile manager."""
 
-    def __init__(self, request: Callable[..., Coroutine]) -> None:
+    def __init__(
+        self,
+        request: Callable[..., Coroutine],
+        *,
+        on_login: Optional[Callable[[], None]] = None,
+        codec: JSONCodec = DEFAULT_CODEC,
+    ) -> None:
         """Initialize."""
+        self.codec: JSONCodec = codec
+        self._credentials: Optional[Tuple[str, str]] = None
+        self._internal_ids: Dict[str, str] = {}
+        self._login_count: int = 0
+        # Created on first use (so that it's bound to the loop the profile runs in):
+        self._login_lock: Optional[asyncio.Lock] = None
+        self._on_login: Optional[Callable[[], None]] = on_login
         self._request: Callable[..., Coroutine] = request
         self.account_id: Optional[str] = None
 
+    async def _authenticated_request(self, method: str, url: str, **kwargs) -> dict:
+        """Make a request that requires login, logging in again if the session expired.
+
+        Only one new login is made no matter how many concurrent requests detect the
+        expired session; each of them is then retried once.
+        """
+        login_count = self._login_count
+        resp: dict = await self._request(method, url, **kwargs)
+
+        if resp.get("Code") not in AUTH_FAILURE_CODES or not self._credentials:
+            return resp
+
+        if self._login_lock is None:
+            self._login_lock = asyncio.Lock()
+        async with self._login_lock:
+            if self._login_count == login_count:
+                _LOGGER.debug("Session expired; logging in again")
+                if not await self.login(*self._credentials):
+                    return resp
+
+        return await self._request(method, url, **kwargs)
+
+    def set_credentials(self, email: str, password: str) -> None:
+        """Set the credentials used to log in again if the session expires.
+
+        This lets a profile whose session was restored (rather than created by login)
+        recover once that session expires.
+        """
+        self._credentials = (email, password)
+
     async def login(self, email: str, password: str) -> bool:
-        """Login to the profile."""
+        """Login to the profile.
+
+        The credentials are kept so that the profile can log in again if its session
+        expires.
+        """
         login_resp: dict = await self._request(
             "post",
             API_URL_USER,
@@ -38,18 +129,27 @@ class Profile:
         if login_resp.get("Code") != 0:
             return False
 
+        if login_resp["Json"]["gid"] != self.account_id:
+            self._internal_ids.clear()
         self.account_id = login_resp["Json"]["gid"]
+        self._credentials = (email, password)
+        self._login_count += 1
+
+        if self._on_login:
+            self._on_login()
 
         return True
 
-    async def packages(
+    async def _get_packages_page(
         self,
-        package_state: Union[int, str] = "",
-        show_archived: bool = False,
-        tz: str = "UTC",
-    ) -> list:
-        """Get the list of packages associated with the account."""
-        packages_resp: dict = await self._request(
+        page: int,
+        page_size: int,
+        package_state: Union[int, str],
+        show_archived: bool,
+        item: str = "",
+    ) -> dict:
+        """Get a single page of the account's package list."""
+        packages_resp: dict = await self._authenticated_request(
             "post",
             API_URL_BUYER,
             json={
@@ -57,9 +157,9 @@ class Profile:
                 "method": "GetTrackInfoList",
                 "param": {
                     "IsArchived": show_archived,
-                    "Item": "",
-                    "Page": 1,
-                    "PerPage": 40,
+                    "Item": item,
+                    "Page": page,
+                    "PerPage": page_size,
                     "PackageState": package_state,
                     "Sequence": "0",
                 },
@@ -67,33 +167,277 @@ class Profile:
             },
         )
 
-        _LOGGER.debug("Packages response: %s", packages_resp)
-
-        packages: List[Package] = []
-        for package in packages_resp.get("Json", []):
-            event: dict = {}
-            last_event_raw: str = package.get("FLastEvent")
-            if last_event_raw:
-                event = json.loads(last_event_raw)
-
-            kwargs: dict = {
-                "id": package.get("FTrackInfoId"),
-                "destination_country": package.get("FSecondCountry", 0),
-                "friendly_name": package.get("FRemark"),
-                "info_text": event.get("z"),
-                "location": " ".join([event.get("c", ""), event.get("d", "")]).strip(),
-                "timestamp": event.get("a"),
-                "tz": tz,
-                "origin_country": package.get("FFirstCountry", 0),
-                "package_type": package.get("FTrackStateType", 0),
-                "status": package.get("FPackageState", 0),
-            }
-            packages.append(Package(package["FTrackNo"], **kwargs))
+        _LOGGER.debug("Packages response (page %s): %s", page, packages_resp)
+
+        for row in packages_resp.get("Json", []):
+            if row.get("FTrackInfoId"):
+                self._internal_ids[row["FTrackNo"]] = row["FTrackInfoId"]
+
+        return packages_resp
+
+    def _parse_packages(
+        self, packages_resp: dict, tz: str, lazy: bool = False
+    ) -> List[Union[LazyPackage, Package]]:
+        """Parse the packages contained in a package list response."""
+        rows = packages_resp.get("Json", [])
+        if lazy:
+            return [LazyPackage(row, tz, self.codec) for row in rows]
+        return Package.from_profile_rows(rows, tz, self.codec)
+
+    @staticmethod
+    def _page_capacity(first_resp: dict, page_size: int) -> int:
+        """Estimate how many rows a full page of a package list holds.
+
+        The server may cap the requested page size (in which case it either echoes the
+        actual one or returns fewer rows than requested, despite there being more).
+        """
+        page_info: dict = first_resp.get("pageInfo") or {}
+        rows = len(first_resp.get("Json") or [])
+        capacity = min(page_size, int(page_info.get("PerPage") or page_size))
+        total_count = int(page_info.get("TotalCount") or 0)
+        if 0 < rows < capacity and total_count > rows:
+            capacity = rows
+        return max(1, capacity)
+
+    @staticmethod
+    def _total_pages(first_resp: dict, capacity: int) -> int:
+        """Estimate how many pages a package list spans (from its first page)."""
+        total_count = int((first_resp.get("pageInfo") or {}).get("TotalCount") or 0)
+        return max(1, math.ceil(total_count / capacity))
+
+    @staticmethod
+    def _is_full(packages_resp: dict, capacity: int) -> bool:
+        """Return whether a page is full (so that the next one may hold more rows)."""
+        return len(packages_resp.get("Json") or []) >= capacity
+
+    @staticmethod
+    def _is_repeat(packages_resp: dict, previous_resp: dict) -> bool:
+        """Return whether a page repeats the previous one (i.e., Page was ignored)."""
+        rows = packages_resp.get("Json") or []
+        previous_rows = previous_resp.get("Json") or []
+        return bool(rows) and rows[:1] == previous_rows[:1]
+
+    async def _get_all_packages_pages(  # pylint: disable=too-many-arguments
+        self,
+        page_size: int,
+        package_state: Union[int, str],
+        show_archived: bool,
+        max_concurrent_pages: int,
+        item: str = "",
+    ) -> List[dict]:
+        """Get every page of the account's package list (in page order).
+
+        The pages that the first page's pageInfo accounts for are requested
+        concurrently. Since TotalCount can't be relied on, more pages are then
+        requested (max_concurrent_pages at a time) for as long as the last one is full.
+        """
+        first_resp = await self._get_packages_page(
+            1, page_size, package_state, show_archived, item
+        )
+        capacity = self._page_capacity(first_resp, page_size)
+        semaphore = asyncio.Semaphore(max_concurrent_pages)
+
+        async def get_page(page_number: int) -> dict:
+            """Get a single page while respecting the concurrency limit."""
+            async with semaphore:
+                return await self._get_packages_page(
+                    page_number, page_size, package_state, show_archived, item
+                )
+
+        responses = [first_resp]
+        responses.extend(
+            await asyncio.gather(
+                *(
+                    get_page(num)
+                    for num in range(2, self._total_pages(first_resp, capacity) + 1)
+                )
+            )
+        )
+
+        while self._is_full(responses[-1], capacity):
+            next_page = len(responses) + 1
+            for packages_resp in await asyncio.gather(
+                *(
+                    get_page(num)
+                    for num in range(next_page, next_page + max_concurrent_pages)
+                )
+            ):
+                if self._is_repeat(packages_resp, responses[-1]):
+                    return responses
+                responses.append(packages_resp)
+                if not self._is_full(packages_resp, capacity):
+                    break
+
+        return responses
+
+    async def packages(  # pylint: disable=too-many-arguments
+        self,
+        package_state: Union[int, str] = "",
+        show_archived: bool = False,
+        tz: str = "UTC",
+        *,
+        page: int = 1,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        fetch_all: bool = False,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+        lazy: bool = False,
+        item: str = "",
+    ) -> list:
+        """Get the list of packages associated with the account.
+
+        By default, only a single page (of size page_size) is returned; if fetch_all is
+        True, every page is requested (up to max_concurrent_pages at a time) and the
+        results are merged in page order.
+
+        If lazy is True, LazyPackage objects (which decode their fields on first
+        access) are returned instead of Package objects; item optionally restricts the
+        list to packages matching a tracking number/friendly name search.
+        """
+        if fetch_all:
+            responses = await self._get_all_packages_pages(
+                page_size, package_state, show_archived, max_concurrent_pages, item
+            )
+        else:
+            responses = [
+                await self._get_packages_page(
+                    page, page_size, package_state, show_archived, item
+                )
+            ]
+
+        packages: List[Union[LazyPackage, Package]] = []
+        for packages_resp in responses:
+            packages.extend(self._parse_packages(packages_resp, tz, lazy))
         return packages
 
+    async def package_rows(
+        self,
+        package_state: Union[int, str] = "",
+        show_archived: bool = False,
+        *,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    ) -> List[dict]:
+        """Get every raw (unparsed) package list row associated with the account.
+
+        Raises RequestError if any page reports an error (e.g., an expired session),
+        so that a failed listing is never mistaken for an empty account.
+        """
+        rows: List[dict] = []
+        for packages_resp in await self._get_all_packages_pages(
+            page_size, package_state, show_archived, max_concurrent_pages
+        ):
+            code = packages_resp.get("Code", 0)
+            if code != 0:
+                raise RequestError(f"Non-zero status code in response: {code}")
+            rows.extend(packages_resp.get("Json", []))
+        return rows
+
+    async def iter_packages(
+        self,
+        package_state: Union[int, str] = "",
+        show_archived: bool = False,
+        tz: str = "UTC",
+        *,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        lazy: bool = False,
+        item: str = "",
+    ) -> AsyncIterator[Union[LazyPackage, Package]]:
+        """Yield every package associated with the account, one page at a time.
+
+        Pages are requested sequentially and each package is yielded as soon as its
+        page has been parsed, so only a single page is held in memory at once.
+        """
+        page = 1
+        capacity = total_pages = 1
+        previous_resp: dict = {}
+        while True:
+            packages_resp = await self._get_packages_page(
+                page, page_size, package_state, show_archived, item
+            )
+            if page == 1:
+                capacity = self._page_capacity(packages_resp, page_size)
+                total_pages = self._total_pages(packages_resp, capacity)
+            elif page > total_pages and self._is_repeat(packages_resp, previous_resp):
+                return
+            previous_resp = packages_resp
+
+            for package in self._parse_packages(packages_resp, tz, lazy):
+                yield package
+
+            # Keep going while pages come back full (see _get_all_packages_pages):
+            if page >= total_pages and not self._is_full(packages_resp, capacity):
+                return
+            page += 1
+
+    async def query(  # pylint: disable=too-many-arguments
+        self,
+        states: Iterable[Union[int, str]] = (),
+        item: str = "",
+        show_archived: bool = False,
+        tz: str = "UTC",
+        *,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+        lazy: bool = False,
+    ) -> list:
+        """Get the packages in any of several states and/or matching a search.
+
+        states may contain status codes or names (e.g., "In Transit"); item is a
+        tracking number/friendly name search. Both filters are applied by 17track.net,
+        each state is requested concurrently and the results are merged (in the order
+        of states) with duplicates removed.
+        """
+        codes: List[Union[int, str]] = []
+        for state in states:
+            if isinstance(state, str) and state in PACKAGE_STATUS_NAMES:
+                state = PACKAGE_STATUS_NAMES[state]
+            if state not in codes:
+                codes.append(state)
+        if not codes:
+            codes = [""]
+
+        responses_per_state = await asyncio.gather(
+            *(
+                self._get_all_packages_pages(
+                    page_size, code, show_archived, max_concurrent_pages, item
+                )
+                for code in codes
+            )
+        )
+
+        seen = set()
+        rows: List[dict] = []
+        for responses in responses_per_state:
+            for packages_resp in responses:
+                for row in packages_resp.get("Json", []):
+                    key = (row.get("FTrackInfoId"), row["FTrackNo"])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    rows.append(row)
+
+        return self._parse_packages({"Json": rows}, tz, lazy)
+
+    async def package_batch(
+        self,
+        package_state: Union[int, str] = "",
+        show_archived: bool = False,
+        tz: str = "UTC",
+        *,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    ) -> PackageBatch:
+        """Get every package associated with the account as a columnar batch."""
+        batch = PackageBatch()
+        for packages_resp in await self._get_all_packages_pages(
+            page_size, package_state, show_archived, max_concurrent_pages
+        ):
+            batch.extend_profile_rows(packages_resp.get("Json", []), tz, self.codec)
+        return batch
+
     async def summary(self, show_archived: bool = False) -> dict:
         """Get a quick summary of how many packages are in an account."""
-        summary_resp: dict = await self._request(
+        summary_resp: dict = await self._authenticated_request(
             "post",
             API_URL_BUYER,
             json={
@@ -113,11 +457,27 @@ class Profile:
             results[key] = value if key not in results else results[key] + value
         return results
 
+    async def internal_id(self, tracking_number: str) -> str:
+        """Get the internal ID of a package in the account by its tracking number.
+
+        IDs are indexed from every package listing (and add call), so the package list
+        is only fetched if the tracking number hasn't been seen yet.
+        """
+        if tracking_number not in self._internal_ids:
+            await self.package_rows()
+
+        try:
+            return self._internal_ids[tracking_number]
+        except KeyError:
+            raise InvalidTrackingNumberError(
+                f"Package not found by tracking number: {tracking_number}"
+            ) from None
+
     async def add_package(
         self, tracking_number: str, friendly_name: Optional[str] = None
     ):
         """Add a package by tracking number to the tracking list."""
-        add_resp: dict = await self._request(
+        add_resp: dict = await self._authenticated_request(
             "post",
             API_URL_BUYER,
             json={
@@ -133,29 +493,176 @@ class Profile:
         if code != 0:
             raise RequestError(f"Non-zero status code in response: {code}")
 
+        self._index_added_items(add_resp)
+
         if not friendly_name:
             return
 
-        packages = await self.packages()
         try:
-            new_package = next(
-                p for p in packages if p.tracking_number == tracking_number
-            )
-        except StopIteration:
+            internal_id = await self.internal_id(tracking_number)
+        except InvalidTrackingNumberError:
             raise InvalidTrackingNumberError(
                 f"Recently added package not found by tracking number: {tracking_number}"
+            ) from None
+
+        _LOGGER.debug("Found internal ID of recently added package: %s", internal_id)
+
+        await self.set_friendly_name(internal_id, friendly_name)
+
+    def _index_added_items(self, add_resp: dict) -> None:
+        """Index the internal IDs returned by an AddTrackNo call (if any)."""
+        for item in add_resp.get("Json", {}).get("Items", []):
+            if item.get("ResultCode") == 0 and item.get("TrackInfoId") not in (
+                None,
+                "",
+                "0",
+            ):
+                self._internal_ids[item["TrackNo"]] = item["TrackInfoId"]
+
+    async def _add_tracking_numbers(
+        self,
+        tracking_numbers: List[str],
+        result: AddPackagesResult,
+        track_nos: Dict[str, str],
+    ) -> None:
+        """Add a single batch of tracking numbers, recording the outcome of each.
+
+        Results are matched back to the requested tracking numbers (which 17track.net
+        may return normalized); track_nos maps each matched one to the returned one.
+        """
+        try:
+            add_resp: dict = await self._authenticated_request(
+                "post",
+                API_URL_BUYER,
+                json={
+                    "version": "1.0",
+                    "method": "AddTrackNo",
+                    "param": {"TrackNos": tracking_numbers},
+                },
+            )
+        except RequestError as err:
+            for tracking_number in tracking_numbers:
+                result.failures[tracking_number] = err
+            return
+
+        _LOGGER.debug("Add packages response: %s", add_resp)
+
+        self._index_added_items(add_resp)
+
+        items = add_resp.get("Json", {}).get("Items")
+        if not items:
+            code = add_resp.get("Code")
+            for tracking_number in tracking_numbers:
+                if code == 0:
+                    result.added[tracking_number] = None
+                else:
+                    result.failures[tracking_number] = RequestError(
+                        f"Non-zero status code in response: {code}"
+                    )
+            return
+
+        # Several requested numbers can normalize to the same one:
+        requested: Dict[str, List[str]] = {}
+        for tracking_number in tracking_numbers:
+            requested.setdefault(
+                _normalize_tracking_number(tracking_number), []
+            ).append(tracking_number)
+
+        for item in items:
+            track_no = item.get("TrackNo") or ""
+            matches = requested.pop(_normalize_tracking_number(track_no), [])
+            if not matches:
+                _LOGGER.debug("Ignoring unrequested tracking number: %s", track_no)
+
+            code = item.get("ResultCode")
+            for tracking_number in matches:
+                track_nos[tracking_number] = track_no
+                if code == 0:
+                    result.added[tracking_number] = None
+                else:
+                    result.failures[tracking_number] = RequestError(
+                        f"Non-zero result code for {tracking_number}: {code}"
+                    )
+
+        for matches in requested.values():
+            for tracking_number in matches:
+                result.failures[tracking_number] = RequestError(
+                    f"No result in response for {tracking_number}"
+                )
+
+    async def add_packages(
+        self,
+        packages: Mapping[str, Optional[str]],
+        *,
+        batch_size: int = DEFAULT_ADD_BATCH_SIZE,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    ) -> AddPackagesResult:
+        """Add many packages (a mapping of tracking number to friendly name).
+
+        Tracking numbers are added in batches; then, if any friendly names were given,
+        the new internal IDs are resolved from a single (paginated) listing and the
+        names are set concurrently. Failures are reported per tracking number rather
+        than raised.
+        """
+        result = AddPackagesResult()
+        track_nos: Dict[str, str] = {}
+        tracking_numbers = list(packages)
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
+
+        async def add_batch(batch: List[str]) -> None:
+            """Add a single batch while respecting the concurrency limit."""
+            async with semaphore:
+                await self._add_tracking_numbers(batch, result, track_nos)
+
+        await asyncio.gather(
+            *(
+                add_batch(tracking_numbers[idx : idx + batch_size])
+                for idx in range(0, len(tracking_numbers), batch_size)
+            )
+        )
+
+        to_rename = [num for num in result.added if packages[num]]
+        if not to_rename:
+            return result
+
+        if any(track_nos.get(num, num) not in self._internal_ids for num in to_rename):
+            try:
+                await self.package_rows(max_concurrent_pages=max_concurrent_requests)
+            except RequestError as err:
+                for tracking_number in to_rename:
+                    result.failures[tracking_number] = err
+                return result
+
+        async def rename(tracking_number: str) -> None:
+            """Set a single friendly name while respecting the concurrency limit."""
+            internal_id = self._internal_ids.get(
+                track_nos.get(tracking_number, tracking_number)
             )
+            if not internal_id:
+                result.failures[tracking_number] = InvalidTrackingNumberError(
+                    f"Recently added package not found by tracking number: "
+                    f"{tracking_number}"
+                )
+                return
 
-        _LOGGER.debug("Found internal ID of recently added package: %s", new_package.id)
+            result.added[tracking_number] = internal_id
+            async with semaphore:
+                try:
+                    await self.set_friendly_name(
+                        internal_id, packages[tracking_number]  # type: ignore
+                    )
+                except RequestError as err:
+                    result.failures[tracking_number] = err
 
-        await self.set_friendly_name(new_package.id, friendly_name)
+        await asyncio.gather(*(rename(num) for num in to_rename))
+        return result
 
     async def set_friendly_name(self, internal_id: str, friendly_name: str):
         """Set a friendly name to an already added tracking number.
 
         internal_id is not the tracking number, it's the ID of an existing package.
         """
-        remark_resp: dict = await self._request(
+        remark_resp: dict = await self._authenticated_request(
             "post",
             API_URL_BUYER,
             json={
@@ -169,4 +676,8 @@ class Profile:
 
         code = remark_resp.get("Code")
         if code != 0:
+            # The indexed internal ID may be stale, so force it to be looked up again:
+            for tracking_number, known_id in list(self._internal_ids.items()):
+                if known_id == internal_id:
+                    self._internal_ids.pop(tracking_number)
             raise RequestError(f"Non-zero status code in response: {code}")
@@ -0,0 +1,115 @@
+"""Define client-side rate limiting."""
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+import attr
+
+
+@attr.s(frozen=True)
+class Rate:
+    """Define a sustained request rate (per second) and the burst allowed above it."""
+
+    per_second: float = attr.ib()
+    burst: int = attr.ib(default=1)
+
+
+@attr.s(slots=True)
+class WaitStats:
+    """Define statistics about the time spent waiting for a token bucket."""
+
+    requests: int = attr.ib(default=0)
+    total_wait: float = attr.ib(default=0.0)
+    max_wait: float = attr.ib(default=0.0)
+    last_wait: float = attr.ib(default=0.0)
+
+    def record(self, wait: float) -> None:
+        """Record a single wait."""
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.last_wait = wait
+
+
+class TokenBucket:
+    """Define an async token bucket.
+
+    Waiters are served in FIFO order; each acquired token allows a single request.
+    """
+
+    def __init__(self, rate: Rate) -> None:
+        """Initialize."""
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._tokens: float = rate.burst
+        self._updated: float = time.monotonic()
+        self.rate: Rate = rate
+        self.stats: WaitStats = WaitStats()
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate.burst, self._tokens + (now - self._updated) * self.rate.per_second
+        )
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token and return how long (in seconds) that took."""
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate.per_second)
+
+        wait = time.monotonic() - start
+        self.stats.record(wait)
+        return wait
+
+
+class RateLimiter:
+    """Define a rate limiter with a token bucket per URL (and, optionally, account).
+
+    Rates are configured per URL (falling back to default, if given); URLs without a
+    rate aren't limited. A single limiter can be shared by several clients so that
+    they collectively stay under 17track.net's throttling thresholds.
+    """
+
+    def __init__(
+        self,
+        *,
+        default: Optional[Rate] = None,
+        per_url: Optional[Dict[str, Rate]] = None,
+        per_account: bool = True,
+    ) -> None:
+        """Initialize."""
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self.default: Optional[Rate] = default
+        self.per_account: bool = per_account
+        self.per_url: Dict[str, Rate] = per_url or {}
+
+    def _get_bucket(self, url: str, account_id: Optional[str]) -> Optional[TokenBucket]:
+        """Get the bucket for a URL/account (creating it if needed)."""
+        key = (url, account_id if self.per_account else None)
+        if key not in self._buckets:
+            rate = self.per_url.get(url, self.default)
+            if rate is None:
+                return None
+            self._buckets[key] = TokenBucket(rate)
+        return self._buckets[key]
+
+    async def acquire(self, url: str, account_id: Optional[str] = None) -> float:
+        """Wait until a request to a URL may be made and return the time waited."""
+        bucket = self._get_bucket(url, account_id)
+        if bucket is None:
+            return 0.0
+        return await bucket.acquire()
+
+    def stats(self, url: str, account_id: Optional[str] = None) -> WaitStats:
+        """Return the wait statistics for a URL/account."""
+        bucket = self._get_bucket(url, account_id)
+        if bucket is None:
+            return WaitStats()
+        return bucket.stats
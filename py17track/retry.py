@@ -0,0 +1,104 @@
+"""Define request retry and circuit breaker logic."""
+import asyncio
+import random
+import time
+from typing import Dict, FrozenSet, Hashable, Optional
+
+from aiohttp.client_exceptions import ClientError, ClientResponseError
+import attr
+
+from .errors import CircuitOpenError
+from .track import API_URL_TRACK
+
+# API methods that are safe to retry (since they don't change any account data); the
+# tracking API has no method name, so it is identified by its URL:
+IDEMPOTENT_METHODS: FrozenSet[str] = frozenset(
+    {"GetIndexData", "GetTrackInfoList", API_URL_TRACK}
+)
+
+RETRYABLE_STATUSES: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+
+def is_transient_error(err: Exception) -> bool:
+    """Return whether an error is likely to be resolved by trying again."""
+    if isinstance(err, ClientResponseError):
+        return err.status in RETRYABLE_STATUSES
+    return isinstance(err, (ClientError, asyncio.TimeoutError))
+
+
+@attr.s(frozen=True)
+class RetryPolicy:
+    """Define a capped exponential backoff (with jitter) retry policy.
+
+    The delay before retry number n (starting at 0) is a random value between
+    (1 - jitter) and 1 times min(max_delay, base_delay * 2 ** n).
+    """
+
+    retries: int = attr.ib(default=3)
+    base_delay: float = attr.ib(default=0.5)
+    max_delay: float = attr.ib(default=10.0)
+    jitter: float = attr.ib(default=0.5)
+    methods: FrozenSet[str] = attr.ib(default=IDEMPOTENT_METHODS, converter=frozenset)
+
+    def delay(self, attempt: int) -> float:
+        """Return how long to wait before a particular retry."""
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay * random.uniform(1 - self.jitter, 1)  # nosec
+
+    def retries_for(self, api_method: str) -> int:
+        """Return how many times a particular API method may be retried."""
+        return self.retries if api_method in self.methods else 0
+
+
+class CircuitBreaker:
+    """Define a per-endpoint circuit breaker.
+
+    Once an endpoint has failed failure_threshold times in a row, requests to it fail
+    immediately (with CircuitOpenError) until reset_timeout seconds have passed; a
+    single trial request is then let through, which either closes the circuit (on
+    success) or opens it again (on failure, including an unexpected error). A trial
+    that is cancelled is released, so that another one can be made.
+    """
+
+    def __init__(
+        self, *, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        """Initialize."""
+        self._failures: Dict[Hashable, int] = {}
+        self._opened_at: Dict[Hashable, float] = {}
+        self._trials: Dict[Hashable, bool] = {}
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+
+    def is_open(self, endpoint: Hashable) -> bool:
+        """Return whether requests to an endpoint are currently being rejected."""
+        opened_at: Optional[float] = self._opened_at.get(endpoint)
+        if opened_at is None:
+            return False
+        if time.monotonic() - opened_at < self.reset_timeout:
+            return True
+        return self._trials.get(endpoint, False)
+
+    def before_request(self, endpoint: Hashable) -> None:
+        """Raise if an endpoint's circuit is open (otherwise, allow the request)."""
+        if self.is_open(endpoint):
+            raise CircuitOpenError(f"Circuit open for {endpoint}; failing fast")
+        if endpoint in self._opened_at:
+            self._trials[endpoint] = True
+
+    def record_failure(self, endpoint: Hashable) -> None:
+        """Record a failed request to an endpoint."""
+        self._trials.pop(endpoint, None)
+        failures = self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+        if failures >= self.failure_threshold:
+            self._opened_at[endpoint] = time.monotonic()
+
+    def release(self, endpoint: Hashable) -> None:
+        """Release an endpoint's trial request without recording an outcome."""
+        self._trials.pop(endpoint, None)
+
+    def record_success(self, endpoint: Hashable) -> None:
+        """Record a successful request to an endpoint."""
+        self._failures.pop(endpoint, None)
+        self._opened_at.pop(endpoint, None)
+        self._trials.pop(endpoint, None)
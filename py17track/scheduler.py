@@ -0,0 +1,205 @@
+"""Define adaptive, per-package polling."""
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import attr
+
+from .package import PACKAGE_STATUS_NAMES, Package
+from .profile import DEFAULT_MAX_CONCURRENT_PAGES, DEFAULT_PAGE_SIZE, Profile
+from .track import Track
+
+# How often (in seconds) packages in each state are checked, before taking the age of
+# their latest event into account:
+DEFAULT_INTERVALS: Dict[int, float] = {
+    0: 6 * 3600,  # Not Found
+    10: 3600,  # In Transit
+    20: 7 * 86400,  # Expired
+    30: 2 * 3600,  # Ready to be Picked Up
+    35: 3600,  # Undelivered
+    40: 7 * 86400,  # Delivered
+    50: 7 * 86400,  # Returned
+}
+
+
+@attr.s(frozen=True)
+class PollPolicy:
+    """Define how often a package should be checked.
+
+    A package's interval is the interval of its state, multiplied by recent_factor if
+    its latest event is newer than recent_age (or by stale_factor if it is older than
+    stale_age), and then clamped between min_interval and max_interval. Packages whose
+    lookup failed are retried after failure_interval. Every full_interval seconds, the
+    whole package list is fetched (to pick up packages that were added elsewhere).
+    """
+
+    intervals: Dict[int, float] = attr.ib(factory=lambda: dict(DEFAULT_INTERVALS))
+    default_interval: float = attr.ib(default=3600.0)
+    recent_age: float = attr.ib(default=86400.0)
+    recent_factor: float = attr.ib(default=0.5)
+    stale_age: float = attr.ib(default=7 * 86400.0)
+    stale_factor: float = attr.ib(default=4.0)
+    min_interval: float = attr.ib(default=300.0)
+    max_interval: float = attr.ib(default=30 * 86400.0)
+    failure_interval: float = attr.ib(default=3600.0)
+    full_interval: float = attr.ib(default=86400.0)
+
+    def interval(self, package: Package, now: float) -> float:
+        """Return how long to wait before checking a package again."""
+        interval = self.intervals.get(
+            PACKAGE_STATUS_NAMES.get(package.status, -1), self.default_interval
+        )
+
+        if package.timestamp:
+            age = now - package.timestamp.timestamp()
+            if age < self.recent_age:
+                interval *= self.recent_factor
+            elif age > self.stale_age:
+                interval *= self.stale_factor
+
+        return min(self.max_interval, max(self.min_interval, interval))
+
+
+class PollScheduler:
+    """Define a scheduler that only re-fetches the packages that are due.
+
+    Every package (keyed by tracking number) gets a next-check time from a PollPolicy.
+    Each poll fetches the states that have due packages (or, if a Track is given, looks
+    the due packages up directly); due packages that have moved to another state are
+    then looked up by tracking number.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        profile: Profile,
+        *,
+        policy: Optional[PollPolicy] = None,
+        track: Optional[Track] = None,
+        show_archived: bool = False,
+        tz: str = "UTC",
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    ) -> None:
+        """Initialize."""
+        self._last_full_poll: Optional[float] = None
+        self._max_concurrent_pages: int = max_concurrent_pages
+        self._page_size: int = page_size
+        self._profile: Profile = profile
+        self._show_archived: bool = show_archived
+        self._track: Optional[Track] = track
+        self._tz: str = tz
+        self.next_checks: Dict[str, float] = {}
+        self.packages: Dict[str, Package] = {}
+        self.policy: PollPolicy = policy or PollPolicy()
+
+    def due(self, now: Optional[float] = None) -> List[Package]:
+        """Return the packages that are due to be checked."""
+        now = time.time() if now is None else now
+        return [
+            self.packages[number]
+            for number, next_check in self.next_checks.items()
+            if next_check <= now
+        ]
+
+    def next_check(self) -> Optional[float]:
+        """Return when the next package is due (or None if no packages are known)."""
+        times = list(self.next_checks.values())
+        if self._last_full_poll is not None:
+            times.append(self._last_full_poll + self.policy.full_interval)
+        return min(times, default=None)
+
+    def update(self, packages: Iterable[Package], now: Optional[float] = None) -> None:
+        """Store checked packages and schedule their next checks.
+
+        Packages without an ID (i.e., from tracking lookups or push notifications) keep
+        the ID and friendly name of the package they replace.
+        """
+        now = time.time() if now is None else now
+        for package in packages:
+            stored = self.packages.get(package.tracking_number)
+            if package.id is None and stored is not None:
+                package = Package._from_fields(  # pylint: disable=protected-access
+                    **{
+                        **attr.asdict(package, recurse=False),
+                        "id": stored.id,
+                        "friendly_name": stored.friendly_name,
+                    }
+                )
+            self.packages[package.tracking_number] = package
+            self.next_checks[package.tracking_number] = now + self.policy.interval(
+                package, now
+            )
+
+    def _remove(self, tracking_numbers: Iterable[str]) -> None:
+        """Forget packages (e.g., because they were deleted from the account)."""
+        for number in tracking_numbers:
+            self.packages.pop(number, None)
+            self.next_checks.pop(number, None)
+
+    async def _query(self, states: Iterable[int] = (), item: str = "") -> List[Package]:
+        """Get the packages in some states and/or matching a search."""
+        return await self._profile.query(
+            states,
+            item,
+            self._show_archived,
+            self._tz,
+            page_size=self._page_size,
+            max_concurrent_pages=self._max_concurrent_pages,
+        )
+
+    async def _poll_full(self, now: float) -> List[Package]:
+        """Get every package."""
+        packages = await self._query()
+        self._remove(
+            set(self.packages) - {package.tracking_number for package in packages}
+        )
+        self.update(packages, now)
+        self._last_full_poll = now
+        return packages
+
+    async def _poll_due(self, due: List[Package], now: float) -> List[Package]:
+        """Get the packages that are due (and anything fetched alongside them)."""
+        if self._track:
+            result = await self._track.find_many(
+                (p.tracking_number for p in due), self._tz
+            )
+            self.update(result.packages, now)
+            for number in result.failures:
+                if number in self.next_checks:
+                    self.next_checks[number] = now + self.policy.failure_interval
+            return [self.packages[p.tracking_number] for p in result.packages]
+
+        states: Set[int] = {PACKAGE_STATUS_NAMES.get(p.status, 0) for p in due}
+        packages = await self._query(sorted(states))
+        checked = {package.tracking_number for package in packages}
+
+        moved = [p.tracking_number for p in due if p.tracking_number not in checked]
+        for number, found in zip(
+            moved, await asyncio.gather(*(self._query(item=num) for num in moved))
+        ):
+            found = [package for package in found if package.tracking_number == number]
+            if not found:
+                self._remove([number])
+            packages.extend(found)
+
+        self.update(packages, now)
+        return packages
+
+    async def poll(self, now: Optional[float] = None) -> List[Package]:
+        """Check the packages that are due and return them (once checked).
+
+        The first poll (and every poll after policy.full_interval has passed) fetches
+        every package; if nothing is due, no requests are made.
+        """
+        now = time.time() if now is None else now
+
+        if (
+            self._last_full_poll is None
+            or now - self._last_full_poll >= self.policy.full_interval
+        ):
+            return await self._poll_full(now)
+
+        due = self.due(now)
+        if not due:
+            return []
+        return await self._poll_due(due, now)
@@ -0,0 +1,262 @@
+"""Define a SQLite-backed persistent package store."""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+from .codec import DEFAULT_CODEC, JSONCodec
+from .errors import SeventeenTrackError
+from .package import (
+    PACKAGE_STATUS_MAP,
+    PACKAGE_STATUS_NAMES,
+    Package,
+    TimestampParser,
+)
+from .profile import DEFAULT_MAX_CONCURRENT_PAGES, DEFAULT_PAGE_SIZE, Profile
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account_id TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    account_id TEXT NOT NULL,
+    tracking_number TEXT NOT NULL,
+    internal_id TEXT,
+    friendly_name TEXT,
+    status INTEGER NOT NULL DEFAULT 0,
+    package_type INTEGER NOT NULL DEFAULT 0,
+    origin_country INTEGER NOT NULL DEFAULT 0,
+    destination_country INTEGER NOT NULL DEFAULT 0,
+    last_event TEXT,
+    timestamp INTEGER,
+    row TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (account_id, tracking_number)
+);
+CREATE INDEX IF NOT EXISTS packages_tracking_number ON packages (tracking_number);
+CREATE INDEX IF NOT EXISTS packages_internal_id ON packages (internal_id);
+CREATE INDEX IF NOT EXISTS packages_status ON packages (account_id, status);
+CREATE INDEX IF NOT EXISTS packages_timestamp ON packages (account_id, timestamp);
+"""
+
+
+class PackageStore:
+    """Define a SQLite store for raw package list rows (and their parsed fields).
+
+    The blocking methods are safe to call from any thread; the async methods run them
+    in a worker thread so that the event loop isn't blocked.
+    """
+
+    def __init__(
+        self, path: str = ":memory:", *, codec: JSONCodec = DEFAULT_CODEC
+    ) -> None:
+        """Initialize."""
+        self._codec: JSONCodec = codec
+        self._connection: sqlite3.Connection = sqlite3.connect(
+            path, check_same_thread=False
+        )
+        self._lock: threading.Lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def save_rows(self, account_id: str, rows: Iterable[dict], tz: str = "UTC") -> int:
+        """Replace an account's stored packages with raw package list rows."""
+        now = time.time()
+        parse = TimestampParser(tz)
+        records = []
+        for row in rows:
+            last_event_raw: Optional[str] = row.get("FLastEvent")
+            event: dict = self._codec.loads(last_event_raw) if last_event_raw else {}
+            timestamp: Optional[int] = None
+            if event.get("a") is not None:
+                timestamp = int(parse(event["a"]).timestamp())
+
+            records.append(
+                (
+                    account_id,
+                    row["FTrackNo"],
+                    row.get("FTrackInfoId"),
+                    row.get("FRemark"),
+                    row.get("FPackageState", 0),
+                    row.get("FTrackStateType", 0),
+                    row.get("FFirstCountry", 0),
+                    row.get("FSecondCountry", 0),
+                    last_event_raw,
+                    timestamp,
+                    self._codec.dumps(row).decode(),
+                    now,
+                )
+            )
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM packages WHERE account_id = ?", (account_id,)
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO packages VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO accounts VALUES (?, ?)", (account_id, now)
+            )
+        return len(records)
+
+    def load_rows(
+        self, account_id: str, *, status: Optional[Iterable[int]] = None
+    ) -> List[dict]:
+        """Load an account's stored raw package list rows (optionally by status)."""
+        query = "SELECT row FROM packages WHERE account_id = ?"
+        params: list = [account_id]
+        if status is not None:
+            statuses = list(status)
+            query += f" AND status IN ({', '.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        query += " ORDER BY rowid"
+
+        with self._lock:
+            cursor = self._connection.execute(query, params)
+            return [self._codec.loads(row) for (row,) in cursor.fetchall()]
+
+    def has_account(self, account_id: str) -> bool:
+        """Return whether an account's packages have ever been stored."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT 1 FROM accounts WHERE account_id = ?", (account_id,)
+            )
+            return cursor.fetchone() is not None
+
+    def summary(self, account_id: str) -> Dict[str, int]:
+        """Return how many stored packages an account has per status."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT status, COUNT(*) FROM packages WHERE account_id = ? "
+                "GROUP BY status",
+                (account_id,),
+            )
+            counts = cursor.fetchall()
+
+        results: Dict[str, int] = {}
+        for status, count in counts:
+            key = PACKAGE_STATUS_MAP.get(status, "Unknown")
+            results[key] = results.get(key, 0) + count
+        return results
+
+    async def async_save_rows(
+        self, account_id: str, rows: Iterable[dict], tz: str = "UTC"
+    ) -> int:
+        """Replace an account's stored packages (in a worker thread)."""
+        return await asyncio.to_thread(self.save_rows, account_id, list(rows), tz)
+
+    async def async_load_rows(
+        self, account_id: str, *, status: Optional[Iterable[int]] = None
+    ) -> List[dict]:
+        """Load an account's stored raw package list rows (in a worker thread)."""
+        return await asyncio.to_thread(self.load_rows, account_id, status=status)
+
+
+class StoredProfile:
+    """Define a profile whose packages and summary are served from a PackageStore.
+
+    If the store already holds the account's packages (e.g., after a restart), they are
+    returned immediately and the store is reconciled with 17track.net in the
+    background; otherwise, the packages are fetched, stored and returned.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        profile: Profile,
+        store: PackageStore,
+        *,
+        account_id: Optional[str] = None,
+        tz: str = "UTC",
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    ) -> None:
+        """Initialize."""
+        self._account_id: Optional[str] = account_id
+        self._max_concurrent_pages: int = max_concurrent_pages
+        self._page_size: int = page_size
+        self._profile: Profile = profile
+        self._store: PackageStore = store
+        self._tz: str = tz
+        self.reconcile_task: Optional[asyncio.Task] = None
+
+    @property
+    def account_id(self) -> str:
+        """Return the ID of the account whose packages are stored.
+
+        Raises SeventeenTrackError if no ID was given and the profile isn't logged in
+        (so that packages from different accounts never share the same bucket).
+        """
+        account_id = self._account_id or self._profile.account_id
+        if not account_id:
+            raise SeventeenTrackError(
+                "No account ID: log in first or pass account_id to StoredProfile"
+            )
+        return account_id
+
+    def _to_packages(self, rows: List[dict]) -> List[Package]:
+        """Parse raw package list rows."""
+        return Package.from_profile_rows(rows, self._tz, self._profile.codec)
+
+    def _schedule_reconcile(self) -> None:
+        """Reconcile the store in the background (if that isn't already happening)."""
+        if self.reconcile_task and not self.reconcile_task.done():
+            return
+        self.reconcile_task = asyncio.create_task(self._background_reconcile())
+
+    async def _background_reconcile(self) -> None:
+        """Reconcile the store, logging (rather than raising) any errors."""
+        try:
+            await self.reconcile()
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("Error reconciling stored packages: %s", err)
+
+    async def reconcile(self) -> List[Package]:
+        """Fetch every package from 17track.net and store it."""
+        rows = await self._profile.package_rows(
+            page_size=self._page_size, max_concurrent_pages=self._max_concurrent_pages
+        )
+        await self._store.async_save_rows(self.account_id, rows, self._tz)
+        return self._to_packages(rows)
+
+    async def packages(
+        self, package_state: Union[int, str] = "", *, reconcile: bool = True
+    ) -> List[Package]:
+        """Get the account's packages, optionally only those in one state.
+
+        package_state may be a status code or name (e.g., "In Transit").
+        """
+        if not await asyncio.to_thread(self._store.has_account, self.account_id):
+            packages = await self.reconcile()
+            if package_state == "":
+                return packages
+        elif reconcile:
+            self._schedule_reconcile()
+
+        if isinstance(package_state, str) and package_state in PACKAGE_STATUS_NAMES:
+            package_state = PACKAGE_STATUS_NAMES[package_state]
+        status = None if package_state == "" else [int(package_state)]
+        rows = await self._store.async_load_rows(self.account_id, status=status)
+        return self._to_packages(rows)
+
+    async def summary(self, *, reconcile: bool = True) -> Dict[str, int]:
+        """Get a summary of how many packages are in the account."""
+        if not await asyncio.to_thread(self._store.has_account, self.account_id):
+            await self.reconcile()
+        elif reconcile:
+            self._schedule_reconcile()
+
+        return await asyncio.to_thread(self._store.summary, self.account_id)
@@ -0,0 +1,124 @@
+"""Define incremental synchronization of an account's packages."""
+from typing import Dict, Iterable, List, Optional, Union
+
+import attr
+
+from .package import Package
+from .profile import DEFAULT_MAX_CONCURRENT_PAGES, DEFAULT_PAGE_SIZE, Profile
+
+
+def package_key(package: Package) -> str:
+    """Return the key that identifies a package across polls."""
+    return package.id or package.tracking_number
+
+
+@attr.s(frozen=True)
+class PackageChange:
+    """Define a change to a single package between two polls."""
+
+    previous: Package = attr.ib()
+    current: Package = attr.ib()
+
+
+@attr.s(frozen=True)
+class PackageDelta:
+    """Define the changes to an account's packages between two polls."""
+
+    added: List[Package] = attr.ib(factory=list)
+    removed: List[Package] = attr.ib(factory=list)
+    status_changed: List[PackageChange] = attr.ib(factory=list)
+    new_events: List[PackageChange] = attr.ib(factory=list)
+    renamed: List[PackageChange] = attr.ib(factory=list)
+
+    def __bool__(self) -> bool:
+        """Return whether anything changed."""
+        return bool(
+            self.added
+            or self.removed
+            or self.status_changed
+            or self.new_events
+            or self.renamed
+        )
+
+
+class PackageSync:
+    """Define a sync engine that turns full package lists into deltas.
+
+    The most recent snapshot is kept (indexed by internal ID, falling back to tracking
+    number), so each poll only reports what changed since the previous one; the first
+    poll reports every package as added.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        profile: Profile,
+        *,
+        package_state: Union[int, str] = "",
+        show_archived: bool = False,
+        tz: str = "UTC",
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrent_pages: int = DEFAULT_MAX_CONCURRENT_PAGES,
+    ) -> None:
+        """Initialize."""
+        self._max_concurrent_pages: int = max_concurrent_pages
+        self._package_state: Union[int, str] = package_state
+        self._page_size: int = page_size
+        self._profile: Profile = profile
+        self._show_archived: bool = show_archived
+        self._tracking_numbers: Dict[str, Package] = {}
+        self._tz: str = tz
+        self.snapshot: Dict[str, Package] = {}
+
+    async def poll(self) -> PackageDelta:
+        """Get the account's packages and return what changed since the last poll."""
+        packages = await self._profile.packages(
+            self._package_state,
+            self._show_archived,
+            self._tz,
+            page_size=self._page_size,
+            fetch_all=True,
+            max_concurrent_pages=self._max_concurrent_pages,
+        )
+        return self.update(packages)
+
+    def get(self, key: str) -> Optional[Package]:
+        """Get a package from the current snapshot by internal ID/tracking number."""
+        package = self.snapshot.get(key)
+        if package is None:
+            package = self._tracking_numbers.get(key)
+        return package
+
+    def update(self, packages: Iterable[Package]) -> PackageDelta:
+        """Replace the snapshot with a new package list and return the delta."""
+        delta = PackageDelta()
+        previous_snapshot = self.snapshot
+        self.snapshot = {package_key(package): package for package in packages}
+        self._tracking_numbers = {
+            package.tracking_number: package for package in self.snapshot.values()
+        }
+
+        for key, current in self.snapshot.items():
+            previous = previous_snapshot.get(key)
+
+            if previous is None:
+                delta.added.append(current)
+                continue
+
+            if previous.status != current.status:
+                delta.status_changed.append(PackageChange(previous, current))
+            if (previous.timestamp, previous.info_text, previous.location) != (
+                current.timestamp,
+                current.info_text,
+                current.location,
+            ):
+                delta.new_events.append(PackageChange(previous, current))
+            if previous.friendly_name != current.friendly_name:
+                delta.renamed.append(PackageChange(previous, current))
+
+        delta.removed.extend(
+            package
+            for key, package in previous_snapshot.items()
+            if key not in self.snapshot
+        )
+
+        return delta
@@ -1,11 +1,25 @@
 """Define interaction with an individual package."""
-from typing import Callable, Coroutine, List
+import asyncio
+from typing import Callable, Coroutine, Dict, Iterable, List, Sequence, Tuple
 
-from .errors import InvalidTrackingNumberError
+import attr
+
+from .errors import InvalidTrackingNumberError, SeventeenTrackError
 from .package import Package
 
 API_URL_TRACK: str = "https://t.17track.net/restapi/track"
 
+DEFAULT_CHUNK_SIZE: int = 40
+DEFAULT_MAX_CONCURRENT_CHUNKS: int = 4
+
+
+@attr.s(frozen=True)
+class TrackResult:
+    """Define the result of looking up many tracking numbers."""
+
+    packages: List[Package] = attr.ib(factory=list)
+    failures: Dict[str, SeventeenTrackError] = attr.ib(factory=dict)
+
 
 class Track:  # pylint: disable=too-few-public-methods
     """Define a 17track.net package manager."""
@@ -14,30 +28,107 @@ class Track:  # pylint: disable=too-few-public-methods
         """Initialize."""
         self._request: Callable[..., Coroutine] = request
 
-    async def find(self, *tracking_numbers: str) -> list:
-        """Get tracking info for one or more tracking numbers."""
+    async def _find_chunk(
+        self, tracking_numbers: Sequence[str], tz: str = "UTC"
+    ) -> TrackResult:
+        """Get tracking info for a single chunk of tracking numbers.
+
+        Requested numbers that are missing from the response are reported as failures.
+        """
         data: dict = {"data": [{"num": num} for num in tracking_numbers]}
         tracking_resp: dict = await self._request("post", API_URL_TRACK, json=data)
 
         if not tracking_resp.get("dat"):
             raise InvalidTrackingNumberError("Invalid data")
 
-        packages: List[Package] = []
+        result = TrackResult(packages=Package.from_track_rows(tracking_resp["dat"], tz))
         for info in tracking_resp["dat"]:
-            package_info: dict = info.get("track", {})
-
-            if not package_info:
-                continue
-
-            kwargs: dict = {
-                "destination_country": package_info.get("c"),
-                "info_text": package_info.get("z0", {}).get("z"),
-                "location": package_info.get("z0", {}).get("c"),
-                "timestamp": package_info.get("z0", {}).get("a"),
-                "origin_country": package_info.get("b"),
-                "package_type": package_info.get("d", 0),
-                "status": package_info.get("e", 0),
-                "tracking_info_language": package_info.get("ln1", "Unknown"),
-            }
-            packages.append(Package(info["no"], **kwargs))
-        return packages
+            if not info.get("track"):
+                result.failures[info["no"]] = InvalidTrackingNumberError(
+                    f"No tracking info found for {info['no']}"
+                )
+
+        returned = {package.tracking_number for package in result.packages}
+        for num in tracking_numbers:
+            if num not in returned and num not in result.failures:
+                result.failures[num] = InvalidTrackingNumberError(
+                    f"{num} was not returned"
+                )
+        return result
+
+    async def _find_chunks(
+        self,
+        tracking_numbers: Iterable[str],
+        tz: str,
+        chunk_size: int,
+        max_concurrent: int,
+    ) -> Tuple[TrackResult, List[SeventeenTrackError]]:
+        """Get tracking info chunk by chunk (returning any chunk-level errors)."""
+        numbers = list(dict.fromkeys(tracking_numbers))
+        chunks = [
+            numbers[idx : idx + chunk_size]
+            for idx in range(0, len(numbers), chunk_size)
+        ]
+        chunk_errors: List[SeventeenTrackError] = []
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def find_chunk(chunk: List[str]) -> TrackResult:
+            """Get a single chunk while respecting the concurrency limit."""
+            async with semaphore:
+                try:
+                    return await self._find_chunk(chunk, tz)
+                except SeventeenTrackError as err:
+                    chunk_errors.append(err)
+                    return TrackResult(failures={num: err for num in chunk})
+
+        result = TrackResult()
+        for chunk_result in await asyncio.gather(*(find_chunk(c) for c in chunks)):
+            result.packages.extend(chunk_result.packages)
+            result.failures.update(chunk_result.failures)
+
+        order = {num: idx for idx, num in enumerate(numbers)}
+        result.packages.sort(key=lambda p: order.get(p.tracking_number, len(order)))
+
+        if len(chunk_errors) < len(chunks):
+            chunk_errors = []
+        return result, chunk_errors
+
+    async def find_many(
+        self,
+        tracking_numbers: Iterable[str],
+        tz: str = "UTC",
+        *,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_concurrent_chunks: int = DEFAULT_MAX_CONCURRENT_CHUNKS,
+    ) -> TrackResult:
+        """Get tracking info for any number of tracking numbers.
+
+        The tracking numbers are split into chunks of chunk_size, which are requested
+        concurrently (up to max_concurrent_chunks at a time). Packages are returned in
+        input order; tracking numbers that couldn't be looked up (individually, or
+        because their whole chunk failed) are reported in failures. Timestamps are
+        interpreted in the tz timezone.
+        """
+        result, _ = await self._find_chunks(
+            tracking_numbers, tz, chunk_size, max_concurrent_chunks
+        )
+        return result
+
+    async def find(
+        self,
+        *tracking_numbers: str,
+        tz: str = "UTC",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_concurrent_chunks: int = DEFAULT_MAX_CONCURRENT_CHUNKS,
+    ) -> list:
+        """Get tracking info for one or more tracking numbers.
+
+        Large inputs are split into concurrently-requested chunks (see find_many); an
+        error is only raised if every chunk fails.
+        """
+        result, chunk_errors = await self._find_chunks(
+            tracking_numbers, tz, chunk_size, max_concurrent_chunks
+        )
+        if chunk_errors:
+            raise chunk_errors[0]
+        return result.packages
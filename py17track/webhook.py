@@ -0,0 +1,197 @@
+"""Define a local receiver for 17track.net push notifications."""
+import asyncio
+from hashlib import sha256
+import hmac
+import ipaddress
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from .codec import DEFAULT_CODEC, JSONCodec
+from .package import Package
+
+_LOGGER: logging.Logger = logging.getLogger(__name__)
+
+DEFAULT_HOST: str = "127.0.0.1"
+DEFAULT_PATH: str = "/17track/webhook"
+DEFAULT_PORT: int = 8080
+
+SIGNATURE_HEADER: str = "sign"
+
+Subscriber = Callable[[Package], Any]
+
+
+def _is_loopback(host: str) -> bool:
+    """Return whether a host only refers to the loopback interface."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class WebhookReceiver:
+    """Define a receiver that turns push notifications into package updates.
+
+    A notification looks like {"event": "TRACKING_UPDATED", "data": {"number": ...,
+    "track": {...}}} (data may also be a list); the track info is mapped the same way
+    as tracking API lookups (see Track.find). Updates that are identical to (or older
+    than) the latest update for a tracking number are dropped; the rest are delivered
+    to every subscriber (which may be a function or a coroutine function). If a
+    subscriber fails, the sender is asked to retry, so delivery is at least once.
+
+    If a secret is given, notifications must carry a signature header: the hex SHA-256
+    digest of the raw body and the secret, joined by a slash.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str = DEFAULT_PATH,
+        secret: Optional[str] = None,
+        tz: str = "UTC",
+        codec: JSONCodec = DEFAULT_CODEC,
+    ) -> None:
+        """Initialize."""
+        self._codec: JSONCodec = codec
+        self._runner: Optional[web.AppRunner] = None
+        self._secret: Optional[str] = secret
+        self._subscribers: List[Subscriber] = []
+        self._tz: str = tz
+        self.latest: Dict[str, Package] = {}
+        self.path: str = path
+
+    def subscribe(self, subscriber: Subscriber) -> Callable[[], None]:
+        """Subscribe to package updates (returning a function that unsubscribes)."""
+        self._subscribers.append(subscriber)
+
+        def unsubscribe() -> None:
+            """Unsubscribe from package updates."""
+            self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    def parse(self, payload: dict) -> List[Package]:
+        """Parse the package updates contained in a notification."""
+        data = payload.get("data") or []
+        if isinstance(data, dict):
+            data = [data]
+        return Package.from_track_rows(
+            [{"no": item["number"], "track": item.get("track")} for item in data],
+            self._tz,
+        )
+
+    def _is_new(self, package: Package) -> bool:
+        """Return whether an update is neither a duplicate nor stale."""
+        latest = self.latest.get(package.tracking_number)
+        if latest is None:
+            return True
+        if package == latest:
+            return False
+        return not (package.timestamp and latest.timestamp) or (
+            package.timestamp >= latest.timestamp
+        )
+
+    async def _deliver(self, package: Package) -> Optional[Exception]:
+        """Deliver an update to every subscriber (returning the first error, if any).
+
+        A failing subscriber doesn't stop the update from reaching the others.
+        """
+        error: Optional[Exception] = None
+        for subscriber in list(self._subscribers):
+            try:
+                result = subscriber(package)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.exception(
+                    "Error delivering update for %s", package.tracking_number
+                )
+                error = error or err
+        return error
+
+    async def handle(self, payload: dict) -> List[Package]:
+        """Handle a notification, returning the (new) updates that were delivered.
+
+        An update is only recorded as the latest once every subscriber has received it
+        without error; otherwise, the first subscriber error is raised (after the other
+        updates have been delivered), so that a retried notification is delivered again.
+        """
+        return await self._handle_packages(self.parse(payload))
+
+    async def _handle_packages(self, packages: List[Package]) -> List[Package]:
+        """Deliver the new updates among parsed packages."""
+        updates = []
+        error: Optional[Exception] = None
+        for package in packages:
+            if not self._is_new(package):
+                _LOGGER.debug("Dropping duplicate/stale update: %s", package)
+                continue
+            delivery_error = await self._deliver(package)
+            if delivery_error is not None:
+                error = error or delivery_error
+                continue
+            self.latest[package.tracking_number] = package
+            updates.append(package)
+
+        if error is not None:
+            raise error
+        return updates
+
+    def _verify(self, body: bytes, signature: str) -> bool:
+        """Verify the signature of a notification."""
+        assert self._secret is not None
+        expected = sha256(body + b"/" + self._secret.encode()).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    async def _handler(self, request: web.Request) -> web.Response:
+        """Respond to a notification."""
+        body = await request.read()
+        if self._secret is not None and not self._verify(
+            body, request.headers.get(SIGNATURE_HEADER, "")
+        ):
+            return web.Response(status=401, text="Invalid signature")
+
+        try:
+            packages = self.parse(self._codec.loads(body))
+        except Exception as err:  # pylint: disable=broad-except
+            # The codecs' decode errors don't share a base class:
+            _LOGGER.warning("Invalid notification: %s", err)
+            return web.Response(status=400, text="Invalid notification")
+
+        try:
+            updates = await self._handle_packages(packages)
+        except Exception:  # pylint: disable=broad-except
+            # Ask the sender to retry (the error has already been logged):
+            return web.Response(status=500, text="Delivery failed")
+
+        return web.json_response({"code": 0, "updates": len(updates)})
+
+    def app(self) -> web.Application:
+        """Create a web application that serves the receiver (e.g., to embed it)."""
+        app = web.Application()
+        app.router.add_post(self.path, self._handler)
+        return app
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        """Start serving the receiver.
+
+        By default, the receiver only listens on the loopback interface (e.g., behind a
+        reverse proxy); it can only listen on other addresses if it has a secret.
+        """
+        if self._secret is None and not _is_loopback(host):
+            raise ValueError(
+                f"A secret is required to listen on a non-loopback address: {host}"
+            )
+
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def close(self) -> None:
+        """Stop serving the receiver."""
+        if self._runner:
+            await self._runner.cleanup()
+        self._runner = None
@@ -1,6 +1,10 @@
 """Define common test utilities."""
+from functools import partial
+import json
 import os
 
+from aiohttp import web
+
 TEST_EMAIL = "user@email.com"
 TEST_PASSWORD = "password"
 
@@ -10,3 +14,60 @@ def load_fixture(filename):
     path = os.path.join(os.path.dirname(__file__), "fixtures", filename)
     with open(path, encoding="utf-8") as fptr:
         return fptr.read()
+
+
+async def _serve_packages_page(requested_pages, request):
+    """Respond with the paginated package fixture matching the requested page."""
+    payload = await request.json()
+    page = payload["param"]["Page"]
+    if requested_pages is not None:
+        requested_pages.append(page)
+    return web.Response(
+        text=load_fixture(f"packages_page_{page}_response.json"), status=200
+    )
+
+
+def paged_packages_handler(requested_pages=None):
+    """Return an aresponses handler that serves the paginated package fixtures."""
+    return partial(_serve_packages_page, requested_pages)
+
+
+def filtering_packages_handler(requested_params=None, max_per_page=None):
+    """Return an aresponses handler that filters the paginated package fixtures.
+
+    If max_per_page is set, pages are silently capped to that many rows (like a
+    server that doesn't honor PerPage would).
+    """
+    rows = []
+    for page in range(1, 4):
+        rows.extend(
+            json.loads(load_fixture(f"packages_page_{page}_response.json"))["Json"]
+        )
+
+    async def handler(request):
+        """Respond with the fixture rows matching the requested state and item."""
+        params = (await request.json())["param"]
+        if requested_params is not None:
+            requested_params.append(params)
+
+        matches = [
+            row
+            for row in rows
+            if params["PackageState"] in ("", row["FPackageState"])
+            and params["Item"] in (row["FTrackNo"] + row["FRemark"])
+        ]
+        per_page = min(params["PerPage"], max_per_page or params["PerPage"])
+        start = (params["Page"] - 1) * per_page
+        return web.json_response(
+            {
+                "pageInfo": {
+                    "Page": params["Page"],
+                    "PerPage": params["PerPage"],
+                    "TotalCount": len(matches),
+                },
+                "Json": matches[start : start + per_page],
+                "Code": 0,
+            }
+        )
+
+    return handler
@@ -1,9 +1,20 @@
 """Define tests for the client object."""
+import asyncio
+import json
+import os
+import stat
+
 import aiohttp
+from aiohttp import web
 import pytest
+from yarl import URL
 
 from py17track import Client
-from py17track.errors import RequestError
+from py17track.errors import CircuitOpenError, RequestError
+from py17track.ratelimit import Rate, RateLimiter
+from py17track.retry import CircuitBreaker, RetryPolicy
+
+from .common import TEST_EMAIL, TEST_PASSWORD, load_fixture
 
 
 @pytest.mark.asyncio
@@ -17,3 +28,402 @@ async def test_bad_request(aresponses):
         async with aiohttp.ClientSession() as session:
             client = Client(session=session)
             await client._request("get", "https://random.domain/no/good")
+
+
+@pytest.mark.asyncio
+async def test_owned_session_reused(aresponses):
+    """Test that the client reuses a single owned session until it is closed."""
+    for _ in range(2):
+        aresponses.add(
+            "random.domain",
+            "/ok",
+            "get",
+            aresponses.Response(text='{"Code": 0}', status=200),
+        )
+
+    client = Client(connection_limit=10, connection_limit_per_host=5)
+    assert await client._request("get", "https://random.domain/ok") == {"Code": 0}
+    session = client._owned_session
+    assert session is not None
+    assert session.connector.limit == 10
+    assert session.connector.limit_per_host == 5
+
+    assert await client._request("get", "https://random.domain/ok") == {"Code": 0}
+    assert client._owned_session is session
+
+    await client.close()
+    assert session.closed
+    assert client._owned_session is None
+
+
+@pytest.mark.asyncio
+async def test_explicit_session_not_closed(aresponses):
+    """Test that closing the client leaves an explicitly-provided session open."""
+    aresponses.add(
+        "random.domain",
+        "/ok",
+        "get",
+        aresponses.Response(text='{"Code": 0}', status=200),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        async with Client(session=session) as client:
+            await client._request("get", "https://random.domain/ok")
+            assert client._owned_session is None
+        assert not session.closed
+
+
+@pytest.mark.asyncio
+async def test_retry_idempotent_method(aresponses):
+    """Test that idempotent API methods are retried on transient errors."""
+    aresponses.add(
+        "random.domain", "/api", "post", aresponses.Response(text="", status=503)
+    )
+    aresponses.add(
+        "random.domain", "/api", "post", aresponses.Response(text="", status=502)
+    )
+    aresponses.add(
+        "random.domain",
+        "/api",
+        "post",
+        aresponses.Response(text='{"Code": 0}', status=200),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, retry_policy=RetryPolicy(base_delay=0))
+        data = await client._request(
+            "post", "https://random.domain/api", json={"method": "GetIndexData"}
+        )
+        assert data == {"Code": 0}
+
+
+@pytest.mark.asyncio
+async def test_retry_exhausted(aresponses):
+    """Test that an error is raised once all retries have been used."""
+    for _ in range(2):
+        aresponses.add(
+            "random.domain", "/api", "post", aresponses.Response(text="", status=503)
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(
+            session=session, retry_policy=RetryPolicy(retries=1, base_delay=0)
+        )
+        with pytest.raises(RequestError):
+            await client._request(
+                "post", "https://random.domain/api", json={"method": "GetIndexData"}
+            )
+
+
+@pytest.mark.asyncio
+async def test_no_retry_non_idempotent_method(aresponses):
+    """Test that non-idempotent API methods (and client errors) aren't retried."""
+    aresponses.add(
+        "random.domain", "/api", "post", aresponses.Response(text="", status=503)
+    )
+    aresponses.add(
+        "random.domain", "/api", "post", aresponses.Response(text="", status=404)
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, retry_policy=RetryPolicy(base_delay=0))
+        with pytest.raises(RequestError):
+            await client._request(
+                "post", "https://random.domain/api", json={"method": "AddTrackNo"}
+            )
+        with pytest.raises(RequestError):
+            await client._request(
+                "post", "https://random.domain/api", json={"method": "GetIndexData"}
+            )
+
+
+def test_retry_policy_delay():
+    """Test that retry delays grow exponentially up to a cap."""
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1, 2, 4, 5, 5]
+    assert policy.retries_for("GetTrackInfoList") == 3
+    assert policy.retries_for("SetTrackRemark") == 0
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker(aresponses):
+    """Test that an open circuit fails fast until its reset timeout has passed."""
+    for _ in range(2):
+        aresponses.add(
+            "random.domain", "/api", "post", aresponses.Response(text="", status=500)
+        )
+    aresponses.add(
+        "random.domain",
+        "/api",
+        "post",
+        aresponses.Response(text='{"Code": 0}', status=200),
+    )
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, circuit_breaker=breaker)
+        for _ in range(2):
+            with pytest.raises(RequestError):
+                await client._request(
+                    "post", "https://random.domain/api", json={"method": "GetIndexData"}
+                )
+
+        # The circuit is now open, so no request is made:
+        with pytest.raises(CircuitOpenError):
+            await client._request(
+                "post", "https://random.domain/api", json={"method": "GetIndexData"}
+            )
+
+        # Other endpoints are unaffected:
+        endpoint = ("https://random.domain/api", "GetIndexData")
+        assert breaker.is_open(endpoint)
+        assert not breaker.is_open(("https://random.domain/api", "AddTrackNo"))
+
+        # Once the reset timeout passes, a trial request closes the circuit:
+        breaker.reset_timeout = 0
+        data = await client._request(
+            "post", "https://random.domain/api", json={"method": "GetIndexData"}
+        )
+        assert data == {"Code": 0}
+        assert not breaker.is_open(endpoint)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_trial_invalid_body(aresponses):
+    """Test that a trial request with an undecodable response reopens the circuit."""
+    aresponses.add(
+        "random.domain", "/api", "post", aresponses.Response(text="", status=200)
+    )
+    aresponses.add(
+        "random.domain",
+        "/api",
+        "post",
+        aresponses.Response(text='{"Code": 0}', status=200),
+    )
+
+    endpoint = ("https://random.domain/api", "GetIndexData")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure(endpoint)
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, circuit_breaker=breaker)
+        with pytest.raises(RequestError):
+            await client._request(
+                "post", "https://random.domain/api", json={"method": "GetIndexData"}
+            )
+
+        # The failed trial reopened the circuit (rather than leaving it stuck):
+        breaker.reset_timeout = 60
+        assert breaker.is_open(endpoint)
+        breaker.reset_timeout = 0
+        data = await client._request(
+            "post", "https://random.domain/api", json={"method": "GetIndexData"}
+        )
+        assert data == {"Code": 0}
+        assert not breaker.is_open(endpoint)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_trial_cancelled(aresponses):
+    """Test that a cancelled trial request doesn't leave the circuit open."""
+
+    async def slow_handler(request):
+        """Respond after a long delay."""
+        await asyncio.sleep(10)
+        return aresponses.Response(text='{"Code": 0}', status=200)
+
+    aresponses.add("random.domain", "/api", "post", slow_handler)
+    aresponses.add(
+        "random.domain",
+        "/api",
+        "post",
+        aresponses.Response(text='{"Code": 0}', status=200),
+    )
+
+    endpoint = ("https://random.domain/api", "GetIndexData")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure(endpoint)
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(
+            session=session, circuit_breaker=breaker, coalesce_requests=False
+        )
+        task = asyncio.ensure_future(
+            client._request(
+                "post", "https://random.domain/api", json={"method": "GetIndexData"}
+            )
+        )
+        await asyncio.sleep(0.1)
+        assert breaker.is_open(endpoint)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert not breaker.is_open(endpoint)
+        data = await client._request(
+            "post", "https://random.domain/api", json={"method": "GetIndexData"}
+        )
+        assert data == {"Code": 0}
+        assert not breaker.is_open(endpoint)
+
+
+@pytest.mark.asyncio
+async def test_invalid_response_body(aresponses):
+    """Test that an undecodable response body raises RequestError."""
+    aresponses.add(
+        "random.domain", "/empty", "get", aresponses.Response(text="", status=200)
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        with pytest.raises(RequestError):
+            await client._request("get", "https://random.domain/empty")
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter(aresponses):
+    """Test that requests are limited per URL and account."""
+    for _ in range(4):
+        aresponses.add(
+            "random.domain",
+            "/limited",
+            "get",
+            aresponses.Response(text='{"Code": 0}', status=200),
+        )
+    aresponses.add(
+        "random.domain",
+        "/unlimited",
+        "get",
+        aresponses.Response(text='{"Code": 0}', status=200),
+    )
+
+    limiter = RateLimiter(
+        per_url={"https://random.domain/limited": Rate(per_second=20, burst=2)}
+    )
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, rate_limiter=limiter)
+        await asyncio.gather(
+            *(client._request("get", "https://random.domain/limited") for _ in range(4))
+        )
+        await client._request("get", "https://random.domain/unlimited")
+
+    stats = limiter.stats("https://random.domain/limited")
+    assert stats.requests == 4
+    # The first two requests use the burst; the other two wait for new tokens:
+    assert stats.max_wait >= 0.08
+    assert stats.total_wait >= 0.12
+    assert limiter.stats("https://random.domain/unlimited").requests == 0
+    # Other accounts get their own bucket:
+    assert limiter.stats("https://random.domain/limited", "12345").requests == 0
+
+
+@pytest.mark.asyncio
+async def test_export_import_session(aresponses, tmp_path):
+    """Test persisting the session state and restoring it in a new client."""
+    aresponses.add(
+        "user.17track.net",
+        "/userapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("authentication_success_response.json"),
+            status=200,
+            headers={"Set-Cookie": "Last-Event-ID=abc123; Domain=.17track.net; Path=/"},
+        ),
+    )
+
+    path = str(tmp_path / "session.json")
+    saved_states = []
+
+    async with Client(session_callback=saved_states.append) as client:
+        await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+        client.save_session(path)
+
+    assert saved_states[0]["account_id"] == "1234567890987654321"
+    assert saved_states[0]["cookies"] == [
+        {
+            "name": "Last-Event-ID",
+            "value": "abc123",
+            "domain": "17track.net",
+            "path": "/",
+        }
+    ]
+
+    async with Client() as client:
+        assert client.load_session(str(tmp_path / "missing.json")) is False
+        assert client.load_session(path) is True
+        assert client.profile.account_id == "1234567890987654321"
+        cookies = client._get_session().cookie_jar.filter_cookies(
+            URL("https://buyer.17track.net/orderapi/call")
+        )
+        assert cookies["Last-Event-ID"].value == "abc123"
+
+
+def test_load_session_without_loop(tmp_path):
+    """Test restoring (and saving) a session before any event loop is running."""
+    path = str(tmp_path / "session.json")
+    state = {
+        "account_id": "1234567890987654321",
+        "cookies": [
+            {
+                "name": "Last-Event-ID",
+                "value": "abc123",
+                "domain": "17track.net",
+                "path": "/",
+            }
+        ],
+    }
+    with open(path, "w", encoding="utf-8") as fptr:
+        json.dump(state, fptr)
+    os.chmod(path, 0o644)
+
+    client = Client()
+    assert client.load_session(path) is True
+    assert client.export_session() == state
+    client.save_session(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    async def get_cookies():
+        """Get the cookies the client's (newly created) session sends to the API."""
+        async with client:
+            return client._get_session().cookie_jar.filter_cookies(
+                URL("https://buyer.17track.net/orderapi/call")
+            )
+
+    assert asyncio.run(get_cookies())["Last-Event-ID"].value == "abc123"
+
+
+@pytest.mark.asyncio
+async def test_restored_session_relogin(aresponses, tmp_path):
+    """Test that a restored session logs in again (with credentials) once it expires."""
+    calls = []
+
+    async def handler(request):
+        """Emulate an API whose restored session has expired."""
+        payload = await request.json()
+        calls.append(payload["method"])
+        if payload["method"] == "Signin":
+            return web.Response(
+                text=load_fixture("authentication_success_response.json"), status=200
+            )
+        if "Signin" not in calls:
+            return web.Response(
+                text=load_fixture("auth_expired_response.json"), status=200
+            )
+        return web.Response(text=load_fixture("summary_response.json"), status=200)
+
+    aresponses.add(
+        aresponses.ANY, aresponses.ANY, "post", handler, repeat=aresponses.INFINITY
+    )
+
+    path = tmp_path / "session.json"
+    path.write_text(
+        '{"account_id": "1234567890987654321", "cookies": [{"name": "Last-Event-ID", '
+        '"value": "expired", "domain": "17track.net", "path": "/"}]}'
+    )
+
+    async with Client() as client:
+        assert client.load_session(str(path), credentials=(TEST_EMAIL, TEST_PASSWORD))
+        summary = await client.profile.summary()
+
+    assert summary["In Transit"] == 6
+    assert calls == ["GetIndexData", "Signin", "GetIndexData"]
@@ -0,0 +1,68 @@
+"""Define tests for the pluggable JSON codecs."""
+import json
+
+import aiohttp
+import pytest
+
+from py17track import Client
+from py17track.codec import JSONCodec, get_codec
+
+from .common import TEST_EMAIL, TEST_PASSWORD, load_fixture
+
+
+def test_get_codec():
+    """Test getting codecs by name (and falling back to the standard library)."""
+    codec = get_codec("json")
+    assert codec.name == "json"
+    assert codec.dumps({"a": [1, "b"]}) == b'{"a":[1,"b"]}'
+    assert codec.loads(b'{"a":[1,"b"]}') == codec.loads('{"a":[1,"b"]}')
+
+    pytest.importorskip("orjson")
+    assert get_codec().name == "orjson"
+    assert get_codec("orjson").loads(b'{"a":1}') == {"a": 1}
+
+
+def test_get_unknown_codec():
+    """Test that getting an unknown codec raises."""
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+@pytest.mark.asyncio
+async def test_custom_codec(aresponses):
+    """Test that a custom codec is used for requests, responses and events."""
+    aresponses.add(
+        "user.17track.net",
+        "/userapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("authentication_success_response.json"), status=200
+        ),
+    )
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("packages_response.json"), status=200),
+    )
+
+    calls = {"dumps": 0, "loads": 0}
+
+    def dumps(obj):
+        calls["dumps"] += 1
+        return json.dumps(obj).encode()
+
+    def loads(data):
+        calls["loads"] += 1
+        return json.loads(data)
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, codec=JSONCodec("counting", dumps, loads))
+        await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+        packages = await client.profile.packages()
+        assert packages[0].location == "Paris"
+
+    # Two requests, two responses and one event per package (minus the one package
+    # that has no event):
+    assert calls["dumps"] == 2
+    assert calls["loads"] == 2 + len(packages) - 1
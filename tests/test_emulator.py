@@ -0,0 +1,83 @@
+"""Define tests for the local 17track.net emulator."""
+import pytest
+
+from py17track import Client
+from py17track.emulator import Emulator, EmulatorConfig, synthetic_rows
+from py17track.errors import RequestError
+from py17track.retry import RetryPolicy
+from py17track.track import Track
+
+from .common import TEST_EMAIL, TEST_PASSWORD
+
+
+@pytest.mark.asyncio
+async def test_account():
+    """Test logging in to, listing and changing an emulated account."""
+    async with Emulator(seed=1) as emulator:
+        emulator.add_account(TEST_EMAIL, TEST_PASSWORD, packages=95)
+
+        async with emulator.session() as session:
+            client = Client(session=session)
+            assert not await client.profile.login(TEST_EMAIL, "wrong")
+            assert await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+
+            packages = await client.profile.packages(fetch_all=True)
+            assert len(packages) == 95
+            assert sum((await client.profile.summary()).values()) == 95
+
+            await client.profile.add_package("NEW0000001", "Shoes")
+            new = await client.profile.query(item="NEW0000001")
+            assert [(p.tracking_number, p.friendly_name) for p in new] == [
+                ("NEW0000001", "Shoes")
+            ]
+
+            track = Track(client._request)
+            result = await track.find_many(["NEW0000001", "UNKNOWN"])
+            assert [p.tracking_number for p in result.packages] == ["NEW0000001"]
+            assert list(result.failures) == ["UNKNOWN"]
+
+    assert emulator.stats.methods["GetTrackInfoList"] == 4
+
+
+@pytest.mark.asyncio
+async def test_session_expiry():
+    """Test that clients log in again once their sessions expire."""
+    async with Emulator() as emulator:
+        emulator.add_account(TEST_EMAIL, TEST_PASSWORD, rows=synthetic_rows(3))
+
+        async with emulator.session() as session:
+            client = Client(session=session)
+            await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+
+            emulator.expire_sessions()
+            assert len(await client.profile.packages()) == 3
+
+    assert emulator.stats.expired == 1
+    assert emulator.stats.methods["Signin"] == 2
+
+
+@pytest.mark.asyncio
+async def test_faults():
+    """Test injecting errors and throttling."""
+    async with Emulator(EmulatorConfig(error_rate=1.0)) as emulator:
+        emulator.add_account(TEST_EMAIL, TEST_PASSWORD, packages=3)
+
+        async with emulator.session() as session:
+            client = Client(session=session)
+            with pytest.raises(RequestError):
+                await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+
+            emulator.config = EmulatorConfig(requests_per_second=2)
+            client = Client(
+                session=session,
+                retry_policy=RetryPolicy(retries=0),
+                coalesce_requests=False,
+            )
+            await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+            await client.profile.summary()
+            await client.profile.summary()
+            with pytest.raises(RequestError):
+                await client.profile.summary()
+
+    assert emulator.stats.errors == 1
+    assert emulator.stats.throttled == 1
@@ -0,0 +1,71 @@
+"""Define tests for streaming package exports."""
+import csv
+import gzip
+import io
+import json
+
+import aiohttp
+import pytest
+
+from py17track import Client
+from py17track.export import FORMAT_CSV, export_packages
+
+from .common import paged_packages_handler
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson(aresponses):
+    """Test exporting every page of packages as NDJSON."""
+    requested_pages = []
+    for _ in range(3):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(requested_pages),
+        )
+
+    stream = io.BytesIO()
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        count = await export_packages(client.profile, stream, page_size=2)
+
+    assert count == 5
+    assert requested_pages == [1, 2, 3]
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["tracking_number"] for record in records] == [
+        f"LP0000000000000{idx}" for idx in range(1, 6)
+    ]
+    assert records[0]["status"] == "In Transit"
+    assert records[0]["timestamp"] == "2021-03-05T10:00:00+00:00"
+
+
+@pytest.mark.asyncio
+async def test_export_csv_gzip(aresponses, tmp_path):
+    """Test exporting packages as gzip-compressed CSV to a file."""
+    for _ in range(3):
+        aresponses.add(
+            "buyer.17track.net", "/orderapi/call", "post", paged_packages_handler()
+        )
+
+    path = tmp_path / "packages.csv.gz"
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        count = await export_packages(
+            client.profile, path, export_format=FORMAT_CSV, page_size=2
+        )
+
+    assert count == 5
+    with gzip.open(path, "rt", encoding="utf-8") as fptr:
+        rows = list(csv.DictReader(fptr))
+    assert len(rows) == 5
+    assert rows[1]["tracking_number"] == "LP00000000000002"
+    assert rows[1]["location"] == "Madrid Spain"
+
+
+@pytest.mark.asyncio
+async def test_export_unknown_format():
+    """Test that an unknown format raises."""
+    with pytest.raises(ValueError):
+        await export_packages(None, io.BytesIO(), export_format="xml")
@@ -0,0 +1,78 @@
+"""Define tests for the multi-account fleet manager."""
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+import pytest
+
+from py17track.fleet import Fleet
+
+from .common import load_fixture
+
+
+@pytest.mark.asyncio
+async def test_poll(aresponses):
+    """Test polling many accounts with global and per-account limits."""
+    in_flight = Counter()
+    max_in_flight = Counter()
+
+    async def handler(request):
+        """Emulate the login and package list methods for several accounts."""
+        payload = await request.json()
+
+        if payload["method"] == "Signin":
+            email = payload["param"]["Email"]
+            if email.startswith("bad"):
+                return web.Response(
+                    text=load_fixture("authentication_failure_response.json")
+                )
+            response = web.Response(
+                text=load_fixture("authentication_success_response.json")
+            )
+            response.set_cookie("user", email, domain=".17track.net")
+            return response
+
+        user = request.cookies["user"]
+        in_flight[user] += 1
+        in_flight["total"] += 1
+        max_in_flight[user] = max(max_in_flight[user], in_flight[user])
+        max_in_flight["total"] = max(max_in_flight["total"], in_flight["total"])
+        await asyncio.sleep(0.01)
+        in_flight[user] -= 1
+        in_flight["total"] -= 1
+
+        data = load_fixture("packages_page_1_response.json")
+        return web.Response(text=data.replace("LP0000", user[0] * 6))
+
+    aresponses.add(
+        aresponses.ANY, aresponses.ANY, "post", handler, repeat=aresponses.INFINITY
+    )
+
+    async with Fleet(
+        max_concurrent_requests=3, max_concurrent_requests_per_account=2
+    ) as fleet:
+        for name in ("alice", "bob", "carol", "dave"):
+            fleet.add_account(f"{name}@email.com", "password", key=name)
+        fleet.add_account("bad@email.com", "password", key="bad")
+
+        result = await fleet.poll()
+
+    assert set(result.results) == {"alice", "bob", "carol", "dave"}
+    assert set(result.failures) == {"bad"}
+    # Each account kept its own cookies:
+    assert result.results["alice"][0].tracking_number == "aaaaaa0000000001"
+    assert result.results["dave"][1].tracking_number == "dddddd0000000002"
+    assert max_in_flight["total"] <= 3
+    assert all(max_in_flight[user] <= 2 for user in max_in_flight if user != "total")
+
+
+@pytest.mark.asyncio
+async def test_duplicate_account():
+    """Test that an account key can't be added twice (leaking the first client)."""
+    async with Fleet() as fleet:
+        fleet.add_account("alice@email.com", "password")
+        with pytest.raises(ValueError):
+            fleet.add_account("alice@email.com", "other")
+        with pytest.raises(ValueError):
+            fleet.add_account("alice2@email.com", "password", key="alice@email.com")
+        assert list(fleet.clients) == ["alice@email.com"]
@@ -0,0 +1,107 @@
+"""Define tests for request instrumentation."""
+import aiohttp
+import pytest
+
+from py17track import Client
+from py17track.errors import RequestError
+from py17track.metrics import RequestMetrics, RequestTrace
+from py17track.retry import RetryPolicy
+
+from .common import TEST_EMAIL, TEST_PASSWORD, load_fixture
+
+
+@pytest.mark.asyncio
+async def test_traces(aresponses):
+    """Test that sent requests are traced and recorded."""
+    aresponses.add(
+        "user.17track.net",
+        "/userapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("authentication_success_response.json"), status=200
+        ),
+    )
+    aresponses.add(
+        "buyer.17track.net", "/orderapi/call", "post", aresponses.Response(status=503)
+    )
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("summary_response.json"), status=200),
+    )
+    aresponses.add(
+        "buyer.17track.net", "/orderapi/call", "post", aresponses.Response(status=404)
+    )
+
+    metrics = RequestMetrics()
+    traces = []
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(
+            session=session,
+            metrics=metrics,
+            on_request=traces.append,
+            retry_policy=RetryPolicy(retries=1, base_delay=0),
+        )
+        await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+        await client.profile.summary()
+        with pytest.raises(RequestError):
+            await client.profile.summary()
+
+    assert [(t.api_method, t.status, t.retries) for t in traces] == [
+        ("Signin", 200, 0),
+        ("GetIndexData", 200, 1),
+        ("GetIndexData", 404, 0),
+    ]
+    assert traces[0].account_id is None
+    assert traces[1].account_id == "1234567890987654321"
+    assert traces[1].bytes_received == len(load_fixture("summary_response.json"))
+    assert traces[1].latency > 0
+    assert isinstance(traces[2].error, RequestError)
+    assert traces[1].statuses == [503, 200]
+
+    counters = metrics.counters["GetIndexData"]
+    assert (counters.requests, counters.errors, counters.retries) == (2, 1, 1)
+    assert counters.statuses == {503: 1, 200: 1, 404: 1}
+    assert metrics.histogram("GetIndexData").count == 2
+    assert metrics.histogram().count == 3
+
+
+@pytest.mark.asyncio
+async def test_on_request_error(aresponses, caplog):
+    """Test that a failing on_request callback doesn't replace the request result."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("summary_response.json"), status=200),
+    )
+
+    def on_request(trace):
+        raise ValueError("Callback bug")
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, on_request=on_request)
+        summary = await client.profile.summary()
+
+    assert summary["In Transit"] == 6
+    assert "Error in on_request callback" in caplog.text
+
+
+def test_histogram():
+    """Test rolling latency histograms and percentiles."""
+    metrics = RequestMetrics(buckets=[0.1, 1.0])
+    for latency in (0.05, 0.05, 0.5, 2.0):
+        metrics.record(RequestTrace("GetIndexData", "url", "POST", latency=latency))
+
+    histogram = metrics.histogram("GetIndexData")
+    assert histogram.counts == (2, 1, 1)
+    assert histogram.mean == pytest.approx(0.65)
+    assert metrics.percentile(50) == 0.5
+    assert metrics.percentile(99) == 2.0
+    assert metrics.histogram("Signin").count == 0
+
+    metrics.window = 0
+    assert metrics.histogram().count == 0
+    assert metrics.counters["GetIndexData"].requests == 4
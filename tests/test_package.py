@@ -0,0 +1,127 @@
+"""Define tests for package objects."""
+from datetime import datetime
+import json
+
+import attr
+import pytest
+from pytz import UTC, timezone
+
+from py17track.emulator import synthetic_rows
+from py17track.package import EPOCH, Package, TimestampParser
+
+from .common import load_fixture
+
+
+def assert_same_packages(actual, expected):
+    """Assert that bulk-created packages are field-for-field equal to expected ones.
+
+    This also guards the bulk constructors' bypass of Package.__init__: their output
+    must hold exactly the attributes (and attribute types) that __init__ produces.
+    """
+    assert len(actual) == len(expected)
+    for package, expected_package in zip(actual, expected):
+        assert type(package) is Package
+        for field in attr.fields(Package):
+            value = getattr(package, field.name)
+            expected_value = getattr(expected_package, field.name)
+            assert value == expected_value, field.name
+            assert type(value) is type(expected_value), field.name
+        assert vars(package) == vars(expected_package)
+
+
+def test_from_profile_rows():
+    """Test that bulk-created packages match individually-created ones."""
+    rows = json.loads(load_fixture("packages_response.json"))["Json"]
+    rows += synthetic_rows(200)
+
+    expected = []
+    for row in rows:
+        event = json.loads(row["FLastEvent"]) if row.get("FLastEvent") else {}
+        expected.append(
+            Package(
+                row["FTrackNo"],
+                id=row.get("FTrackInfoId"),
+                destination_country=row.get("FSecondCountry", 0),
+                friendly_name=row.get("FRemark"),
+                info_text=event.get("z"),
+                location=" ".join([event.get("c", ""), event.get("d", "")]).strip(),
+                timestamp=event.get("a"),
+                tz="Asia/Jakarta",
+                origin_country=row.get("FFirstCountry", 0),
+                package_type=row.get("FTrackStateType", 0),
+                status=row.get("FPackageState", 0),
+            )
+        )
+
+    assert_same_packages(Package.from_profile_rows(rows, "Asia/Jakarta"), expected)
+
+
+def test_from_track_rows():
+    """Test creating packages from tracking API rows (skipping unknown numbers)."""
+    rows = [
+        {
+            "no": "LP1",
+            "track": {
+                "b": 2105,
+                "c": 704,
+                "d": 1,
+                "e": 10,
+                "ln1": "en",
+                "z0": {"a": "2021-03-05 10:00:30", "c": "Berlin", "z": "Sorted"},
+            },
+        },
+        {"no": "LP2", "track": {}},
+    ]
+
+    assert_same_packages(
+        Package.from_track_rows(rows, "Europe/Berlin"),
+        [
+            Package(
+                "LP1",
+                destination_country=704,
+                info_text="Sorted",
+                location="Berlin",
+                timestamp="2021-03-05 10:00:30",
+                tz="Europe/Berlin",
+                origin_country=2105,
+                package_type=1,
+                status=10,
+                tracking_info_language="en",
+            )
+        ],
+    )
+
+
+def test_timestamp_parser():
+    """Test parsing (and memoizing) timestamps in both formats."""
+    parse = TimestampParser("Europe/Paris")
+
+    assert parse("2021-03-05 10:00") == datetime(2021, 3, 5, 9, 0, tzinfo=UTC)
+    assert parse("2021-03-05 10:00:30") == datetime(2021, 3, 5, 9, 0, 30, tzinfo=UTC)
+    assert parse("2021-03-05 10:00") is parse("2021-03-05 10:00")
+    assert parse("") == EPOCH
+    assert parse("2021-03-05T10:00") == EPOCH
+    assert parse("2021-13-05 10:00") == EPOCH
+
+
+@pytest.mark.parametrize(
+    "tz", ["UTC", "Etc/GMT-5", "America/New_York", "Australia/Lord_Howe"]
+)
+def test_timestamp_parser_offsets(tz):
+    """Test that cached UTC offsets match localizing every timestamp."""
+    tzinfo = timezone(tz)
+    parse = TimestampParser(tz)
+    for value in [
+        "2021-03-14 01:59",
+        "2021-03-14 02:30",  # Doesn't exist in New York
+        "2021-03-14 03:00",
+        "2021-04-04 01:15",
+        "2021-04-04 01:45",  # Ambiguous (for half an hour) on Lord Howe Island
+        "2021-11-07 01:30:15",  # Ambiguous in New York
+        "2021-11-07 01:59:59",
+        "2021-11-07 02:00",
+        "2021-11-07 01:00",
+    ]:
+        fmt = "%Y-%m-%d %H:%M:%S" if value.count(":") == 2 else "%Y-%m-%d %H:%M"
+        expected = tzinfo.localize(datetime.strptime(value, fmt)).astimezone(UTC)
+        assert parse.parse(value) == expected
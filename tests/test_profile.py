@@ -1,14 +1,25 @@
 """Define tests for the client object."""
+import asyncio
 from datetime import datetime
 
 import aiohttp
+from aiohttp import web
+import attr
 import pytest
 from pytz import UTC, timezone
 
 from py17track import Client
+from py17track.cache import ResponseCache
 from py17track.errors import InvalidTrackingNumberError, RequestError
+from py17track.package import Package
 
-from .common import TEST_EMAIL, TEST_PASSWORD, load_fixture
+from .common import (
+    TEST_EMAIL,
+    TEST_PASSWORD,
+    filtering_packages_handler,
+    load_fixture,
+    paged_packages_handler,
+)
 
 
 @pytest.mark.asyncio
@@ -59,9 +70,9 @@ async def test_no_explicit_session(aresponses):
         ),
     )
 
-    client = Client()
-    login_result = await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
-    assert login_result is True
+    async with Client() as client:
+        login_result = await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+        assert login_result is True
 
 
 @pytest.mark.asyncio
@@ -93,6 +104,175 @@ async def test_packages(aresponses):
         assert packages[3].location == ""
 
 
+@pytest.mark.asyncio
+async def test_packages_fetch_all(aresponses):
+    """Test getting every page of packages."""
+    requested_pages = []
+    for _ in range(3):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(requested_pages),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        packages = await client.profile.packages(
+            page_size=2, fetch_all=True, max_concurrent_pages=2
+        )
+        assert sorted(requested_pages) == [1, 2, 3]
+        assert [p.tracking_number for p in packages] == [
+            "LP00000000000001",
+            "LP00000000000002",
+            "LP00000000000003",
+            "LP00000000000004",
+            "LP00000000000005",
+        ]
+        assert packages[1].status == "Delivered"
+        assert packages[2].location == "Italy"
+
+
+@pytest.mark.asyncio
+async def test_packages_capped_page_size(aresponses):
+    """Test getting every package when the server returns fewer rows than requested."""
+    requested_params = []
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        filtering_packages_handler(requested_params, max_per_page=2),
+        repeat=aresponses.INFINITY,
+    )
+    tracking_numbers = [f"LP0000000000000{num}" for num in range(1, 6)]
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        packages = await client.profile.packages(
+            page_size=40, fetch_all=True, max_concurrent_pages=2
+        )
+        assert [p.tracking_number for p in packages] == tracking_numbers
+        assert sorted(params["Page"] for params in requested_params) == [1, 2, 3]
+
+        requested_params.clear()
+        packages = [p async for p in client.profile.iter_packages(page_size=40)]
+        assert [p.tracking_number for p in packages] == tracking_numbers
+        assert [params["Page"] for params in requested_params] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_packages_single_page(aresponses):
+    """Test that only the requested page is fetched by default."""
+    requested_pages = []
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        paged_packages_handler(requested_pages),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        packages = await client.profile.packages(page=2, page_size=2)
+        assert requested_pages == [2]
+        assert [p.tracking_number for p in packages] == [
+            "LP00000000000003",
+            "LP00000000000004",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_iter_packages(aresponses):
+    """Test streaming every page of packages."""
+    requested_pages = []
+    for _ in range(3):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(requested_pages),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        tracking_numbers = []
+        async for package in client.profile.iter_packages(page_size=2):
+            # Packages from a page are yielded before the next page is requested:
+            assert len(requested_pages) == (len(tracking_numbers) // 2) + 1
+            tracking_numbers.append(package.tracking_number)
+
+        assert requested_pages == [1, 2, 3]
+        assert tracking_numbers == [
+            "LP00000000000001",
+            "LP00000000000002",
+            "LP00000000000003",
+            "LP00000000000004",
+            "LP00000000000005",
+        ]
+
+
+@pytest.mark.asyncio
+async def test_packages_lazy(aresponses):
+    """Test that lazy packages decode to the same values as eager ones."""
+    for _ in range(2):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            aresponses.Response(
+                text=load_fixture("packages_response.json"), status=200
+            ),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        packages = await client.profile.packages(tz="Asia/Jakarta")
+        lazy_packages = await client.profile.packages(tz="Asia/Jakarta", lazy=True)
+
+        assert len(lazy_packages) == len(packages)
+        assert "timestamp" not in vars(lazy_packages[0])
+        for package, lazy_package in zip(packages, lazy_packages):
+            assert lazy_package.to_package() == package
+            for field in attr.fields(Package):
+                assert getattr(lazy_package, field.name) == getattr(package, field.name)
+        assert "timestamp" in vars(lazy_packages[0])
+
+
+@pytest.mark.asyncio
+async def test_package_batch(aresponses):
+    """Test getting every package as a columnar batch."""
+    for _ in range(6):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        packages = await client.profile.packages(page_size=2, fetch_all=True)
+        batch = await client.profile.package_batch(page_size=2)
+
+        assert len(batch) == 5
+        for package, compact in zip(packages, batch):
+            assert not hasattr(compact, "__dict__")
+            for field in attr.fields(Package):
+                if field.name == "tz":
+                    continue
+                assert getattr(compact, field.name) == getattr(package, field.name)
+
+        in_transit = batch.filter(status=["In Transit"])
+        assert list(in_transit.tracking_numbers) == [
+            "LP00000000000001",
+            "LP00000000000003",
+        ]
+        assert batch.indices(status=[30, 40]) == [1, 3]
+        assert batch.indices(since=packages[2].timestamp.timestamp()) == [2, 3]
+        # Repeated strings are only stored once:
+        assert len(batch.strings) < 4 * len(batch)
+
+
 @pytest.mark.asyncio
 async def test_packages_with_unknown_state(aresponses):
     """Test getting packages."""
@@ -211,6 +391,193 @@ async def test_summary(aresponses):
         assert summary["Unknown"] == 3
 
 
+@pytest.mark.asyncio
+async def test_summary_coalesced(aresponses):
+    """Test that concurrent, identical summary calls share one request."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("summary_response.json"), status=200),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        summaries = await asyncio.gather(*(client.profile.summary() for _ in range(5)))
+        assert all(summary == summaries[0] for summary in summaries)
+        assert summaries[0]["In Transit"] == 6
+
+
+@pytest.mark.asyncio
+async def test_summary_not_coalesced(aresponses):
+    """Test that coalescing can be disabled."""
+    for _ in range(2):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            aresponses.Response(text=load_fixture("summary_response.json"), status=200),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, coalesce_requests=False)
+        await asyncio.gather(client.profile.summary(), client.profile.summary())
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_add_package_not_coalesced(aresponses):
+    """Test that concurrent, identical mutating calls aren't coalesced."""
+    for _ in range(2):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            aresponses.Response(
+                text=load_fixture("add_package_response.json"), status=200
+            ),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        await asyncio.gather(
+            client.profile.add_package("LP00432912409987"),
+            client.profile.add_package("LP00432912409987"),
+        )
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_summary_cached(aresponses):
+    """Test that summaries are cached until a package is added."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("summary_response.json"), status=200),
+    )
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("add_package_response.json"), status=200),
+    )
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("summary_response.json"), status=200),
+    )
+
+    cache = ResponseCache()
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, cache=cache)
+        first = await client.profile.summary()
+        second = await client.profile.summary()
+        assert first == second
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        await client.profile.add_package("LP00432912409987")
+        assert len(cache) == 0
+
+        await client.profile.summary()
+        assert (cache.hits, cache.misses) == (1, 2)
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_response_cache_in_flight_invalidation(aresponses):
+    """Test that a response in flight during an invalidation isn't cached."""
+    release = asyncio.Event()
+    list_requests = []
+
+    async def handler(request):
+        """Hold the first package list request until the package has been added."""
+        payload = await request.json()
+        if payload["method"] == "AddTrackNo":
+            return web.Response(
+                text=load_fixture("add_package_response.json"), status=200
+            )
+        list_requests.append(payload)
+        if len(list_requests) == 1:
+            await release.wait()
+        return web.Response(text=load_fixture("packages_response.json"), status=200)
+
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        handler,
+        repeat=aresponses.INFINITY,
+    )
+
+    cache = ResponseCache()
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, cache=cache)
+        stale = asyncio.ensure_future(client.profile.packages())
+        while not list_requests:
+            await asyncio.sleep(0.01)
+
+        await client.profile.add_package("LP00432912409987")
+        release.set()
+        await stale
+        assert len(cache) == 0
+
+        # The next listing is requested again (and, this time, cached):
+        await client.profile.packages()
+        assert len(list_requests) == 2
+        assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_response_cache_invalidated_by_failed_add(aresponses):
+    """Test that an AddTrackNo error (e.g., one existing number) still invalidates."""
+    for fixture in (
+        "summary_response.json",
+        "add_package_existing_response.json",
+        "summary_response.json",
+    ):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            aresponses.Response(text=load_fixture(fixture), status=200),
+        )
+
+    cache = ResponseCache()
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session, cache=cache)
+        await client.profile.summary()
+        assert len(cache) == 1
+
+        with pytest.raises(RequestError):
+            await client.profile.add_package("1234567890987654321")
+        assert len(cache) == 0
+
+        await client.profile.summary()
+        assert cache.misses == 2
+    aresponses.assert_all_requests_matched()
+
+
+def test_response_cache_eviction():
+    """Test that the response cache evicts expired and least-recently-used entries."""
+    cache = ResponseCache(ttls={"GetIndexData": 60, "GetTrackInfoList": 0}, max_size=2)
+    cache.set("a", "GetIndexData", "1", {"Code": 0})
+    cache.set("b", "GetIndexData", "2", {"Code": 0})
+    assert cache.get("a") == {"Code": 0}
+    cache.set("c", "GetIndexData", "1", {"Code": 0})
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    cache.set("d", "GetTrackInfoList", "1", {"Code": 0})
+    assert cache.get("d") is None
+    assert len(cache) == 1
+
+    assert cache.invalidate(account_id="2") == 0
+    assert cache.invalidate(account_id="1") == 1
+    assert len(cache) == 0
+
+
 @pytest.mark.asyncio
 async def test_add_new_package(aresponses):
     """Test adding a new package."""
@@ -376,3 +743,296 @@ async def test_add_existing_package(aresponses):
             client = Client(session=session)
             await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
             await client.profile.add_package("1234567890987654321")
+
+
+@pytest.mark.asyncio
+async def test_add_packages(aresponses):
+    """Test adding many packages (with friendly names) in bulk."""
+    calls = []
+
+    async def handler(request):
+        """Emulate the AddTrackNo, GetTrackInfoList and SetTrackRemark methods."""
+        payload = await request.json()
+        calls.append(payload)
+
+        if payload["method"] == "AddTrackNo":
+            items = [
+                {
+                    "TrackInfoId": "0",
+                    "TrackNo": num,
+                    "ResultCode": -11010101 if num.startswith("EXISTING") else 0,
+                }
+                for num in payload["param"]["TrackNos"]
+            ]
+            return web.json_response({"Json": {"Items": items}, "Code": 0})
+
+        if payload["method"] == "GetTrackInfoList":
+            added = [
+                num
+                for call in calls
+                if call["method"] == "AddTrackNo"
+                for num in call["param"]["TrackNos"]
+                if not num.startswith(("EXISTING", "MISSING"))
+            ]
+            rows = [{"FTrackNo": num, "FTrackInfoId": f"id-{num}"} for num in added]
+            return web.json_response(
+                {"pageInfo": {"TotalCount": len(rows)}, "Json": rows, "Code": 0}
+            )
+
+        code = -100 if payload["param"]["Remark"] == "Bad name" else 0
+        return web.json_response({"Json": {}, "Code": code})
+
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        handler,
+        repeat=aresponses.INFINITY,
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        result = await client.profile.add_packages(
+            {
+                "LP1": "Shoes",
+                "LP2": None,
+                "EXISTING1": "Hat",
+                "LP3": "Bad name",
+                "MISSING1": "Lost",
+            },
+            batch_size=2,
+        )
+
+    methods = [call["method"] for call in calls]
+    assert methods.count("AddTrackNo") == 3
+    assert methods.count("GetTrackInfoList") == 1
+    assert methods.count("SetTrackRemark") == 2
+
+    # Packages whose friendly name couldn't be set were still added:
+    assert result.added == {
+        "LP1": "id-LP1",
+        "LP2": None,
+        "LP3": "id-LP3",
+        "MISSING1": None,
+    }
+    assert set(result.failures) == {"EXISTING1", "LP3", "MISSING1"}
+    assert isinstance(result.failures["EXISTING1"], RequestError)
+    assert isinstance(result.failures["LP3"], RequestError)
+    assert isinstance(result.failures["MISSING1"], InvalidTrackingNumberError)
+
+
+@pytest.mark.asyncio
+async def test_add_packages_normalized_items(aresponses):
+    """Test matching normalized (or missing) AddTrackNo items to requested numbers."""
+    calls = []
+
+    async def handler(request):
+        """Emulate an AddTrackNo method that normalizes and drops tracking numbers."""
+        payload = await request.json()
+        calls.append(payload["method"])
+
+        if payload["method"] == "AddTrackNo":
+            items = [
+                {"TrackInfoId": "0", "TrackNo": num.strip().upper(), "ResultCode": 0}
+                for num in payload["param"]["TrackNos"]
+                if num != "DROPPED1"
+            ]
+            return web.json_response({"Json": {"Items": items}, "Code": 0})
+
+        rows = [{"FTrackNo": "LP1", "FTrackInfoId": "id-LP1"}]
+        return web.json_response(
+            {"pageInfo": {"TotalCount": 1}, "Json": rows, "Code": 0}
+        )
+
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        handler,
+        repeat=aresponses.INFINITY,
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        result = await client.profile.add_packages(
+            {" lp1 ": "Shoes", "LP2": None, "DROPPED1": "Hat"}
+        )
+
+    assert calls.count("SetTrackRemark") == 1
+    assert result.added == {" lp1 ": "id-LP1", "LP2": None}
+    assert set(result.failures) == {"DROPPED1"}
+    assert isinstance(result.failures["DROPPED1"], RequestError)
+
+
+@pytest.mark.asyncio
+async def test_internal_id_index(aresponses):
+    """Test that internal IDs are indexed from listings."""
+    for _ in range(3):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(),
+        )
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("set_friendly_name_response.json"), status=200
+        ),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        # The first lookup fetches the package list; subsequent ones don't:
+        assert (
+            await client.profile.internal_id("LP00000000000002") == "100000000000000002"
+        )
+        assert (
+            await client.profile.internal_id("LP00000000000001") == "100000000000000001"
+        )
+        await client.profile.set_friendly_name("100000000000000001", "New name")
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_add_package_with_friendly_name_indexed(aresponses):
+    """Test that adding a package whose ID is returned doesn't refetch the list."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(
+            text=(
+                '{"Json": {"Items": [{"TrackInfoId": "987", "TrackNo": "LP123", '
+                '"ResultCode": 0}]}, "Code": 0}'
+            ),
+            status=200,
+        ),
+    )
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("set_friendly_name_response.json"), status=200
+        ),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        await client.profile.add_package("LP123", "Friendly name")
+        assert await client.profile.internal_id("LP123") == "987"
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_internal_id_not_found(aresponses):
+    """Test looking up the internal ID of an unknown tracking number."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(text=load_fixture("packages_response.json"), status=200),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        with pytest.raises(InvalidTrackingNumberError):
+            await client.profile.internal_id("LP-UNKNOWN")
+
+
+@pytest.mark.asyncio
+async def test_query(aresponses):
+    """Test querying packages in several states with server-side filtering."""
+    requested_params = []
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        filtering_packages_handler(requested_params),
+        repeat=aresponses.INFINITY,
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        packages = await client.profile.query(
+            ["In Transit", 30, 10], page_size=1, max_concurrent_pages=2
+        )
+        assert [p.tracking_number for p in packages] == [
+            "LP00000000000001",
+            "LP00000000000003",
+            "LP00000000000004",
+        ]
+        assert {params["PackageState"] for params in requested_params} == {10, 30}
+        # Full pages are followed up (max_concurrent_pages at a time) until one isn't:
+        assert sorted(
+            (params["PackageState"], params["Page"]) for params in requested_params
+        ) == [(10, 1), (10, 2), (10, 3), (10, 4), (30, 1), (30, 2), (30, 3)]
+
+        packages = await client.profile.query(item="Package 4")
+        assert [p.tracking_number for p in packages] == ["LP00000000000004"]
+        assert requested_params[-1]["Item"] == "Package 4"
+
+
+@pytest.mark.asyncio
+async def test_relogin_on_expired_session(aresponses):
+    """Test that an expired session triggers a single new login."""
+    calls = []
+    logged_in = False
+
+    async def handler(request):
+        """Emulate an API whose session expires after the first login."""
+        nonlocal logged_in
+        payload = await request.json()
+        calls.append(payload["method"])
+
+        if payload["method"] == "Signin":
+            # The session from the first login expires immediately:
+            logged_in = len(calls) > 1
+            return web.Response(
+                text=load_fixture("authentication_success_response.json"), status=200
+            )
+        if not logged_in:
+            return web.Response(
+                text=load_fixture("auth_expired_response.json"), status=200
+            )
+        if payload["method"] == "GetIndexData":
+            return web.Response(text=load_fixture("summary_response.json"), status=200)
+        return web.Response(text=load_fixture("packages_response.json"), status=200)
+
+    aresponses.add(
+        aresponses.ANY, aresponses.ANY, "post", handler, repeat=aresponses.INFINITY
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        await client.profile.login(TEST_EMAIL, TEST_PASSWORD)
+
+        summary, packages = await asyncio.gather(
+            client.profile.summary(), client.profile.packages()
+        )
+        assert summary["In Transit"] == 6
+        assert len(packages) == 5
+
+    assert calls.count("Signin") == 2
+    assert calls.count("GetIndexData") == 2
+    assert calls.count("GetTrackInfoList") == 2
+
+
+@pytest.mark.asyncio
+async def test_no_relogin_without_credentials(aresponses):
+    """Test that an expired session is reported as-is if there are no credentials."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("auth_expired_response.json"), status=200
+        ),
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        assert await client.profile.summary() == {}
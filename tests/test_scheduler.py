@@ -0,0 +1,150 @@
+"""Define tests for the adaptive polling scheduler."""
+from datetime import datetime
+
+import aiohttp
+from aiohttp import web
+import pytest
+from pytz import UTC
+
+from py17track import Client
+from py17track.package import Package
+from py17track.scheduler import PollPolicy, PollScheduler
+from py17track.track import Track
+
+from .common import filtering_packages_handler
+
+NOW = datetime(2021, 3, 9, tzinfo=UTC).timestamp()
+
+
+def test_interval():
+    """Test that intervals depend on state and on the age of the latest event."""
+    policy = PollPolicy()
+
+    in_transit = Package("1", status=10, timestamp="2021-03-05 10:00")
+    moving = Package("2", status=10, timestamp="2021-03-08 20:00")
+    stalled = Package("3", status=10, timestamp="2021-02-01 10:00")
+    delivered = Package("4", status=40, timestamp="2021-03-06 11:00")
+    not_found = Package("5")
+
+    assert policy.interval(in_transit, NOW) == 3600
+    assert policy.interval(moving, NOW) == 1800
+    assert policy.interval(stalled, NOW) == 4 * 3600
+    assert policy.interval(delivered, NOW) == 7 * 86400
+    assert policy.interval(not_found, NOW) == 24 * 3600
+    assert PollPolicy(max_interval=86400).interval(delivered, NOW) == 86400
+
+
+@pytest.mark.asyncio
+async def test_poll(aresponses):
+    """Test that only the states with due packages are fetched."""
+    requested_params = []
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        filtering_packages_handler(requested_params),
+        repeat=aresponses.INFINITY,
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        scheduler = PollScheduler(client.profile)
+
+        packages = await scheduler.poll(NOW)
+        assert len(packages) == 5
+        assert [params["PackageState"] for params in requested_params] == [""]
+        assert scheduler.next_check() == NOW + 3600
+
+        # Nothing is due yet, so nothing is requested:
+        requested_params.clear()
+        assert await scheduler.poll(NOW + 60) == []
+        assert not requested_params
+
+        # Pretend that a delivered package was last seen in transit; since it isn't in
+        # that state anymore, it is looked up by tracking number:
+        scheduler.update(
+            [Package("LP00000000000002", status=10, timestamp="2021-03-06 11:00")], NOW
+        )
+
+        packages = await scheduler.poll(NOW + 3600)
+        assert {
+            (params["PackageState"], params["Item"]) for params in requested_params
+        } == {(10, ""), (30, ""), ("", "LP00000000000002")}
+        assert [p.tracking_number for p in packages] == [
+            "LP00000000000001",
+            "LP00000000000003",
+            "LP00000000000004",
+            "LP00000000000002",
+        ]
+        assert scheduler.packages["LP00000000000002"].status == "Delivered"
+        assert scheduler.next_checks["LP00000000000002"] == NOW + 3600 + 7 * 86400
+        assert [p.tracking_number for p in scheduler.due(NOW + 3600)] == []
+
+        # Once a day, everything is fetched again:
+        requested_params.clear()
+        await scheduler.poll(NOW + 86400)
+        assert [params["PackageState"] for params in requested_params] == [""]
+
+
+@pytest.mark.asyncio
+async def test_poll_track(aresponses):
+    """Test polling due packages with tracking lookups (backing off failures)."""
+    requested_numbers = []
+
+    async def track_handler(request):
+        """Return tracking info for the first package only."""
+        numbers = [item["num"] for item in (await request.json())["data"]]
+        requested_numbers.append(numbers)
+        return web.json_response(
+            {
+                "dat": [
+                    {
+                        "no": "LP00000000000001",
+                        "track": {"e": 40, "z0": {"a": "2021-03-09 10:00"}},
+                    }
+                ]
+            }
+        )
+
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        filtering_packages_handler(),
+        repeat=aresponses.INFINITY,
+    )
+    aresponses.add(
+        "t.17track.net",
+        "/restapi/track",
+        "post",
+        track_handler,
+        repeat=aresponses.INFINITY,
+    )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        scheduler = PollScheduler(
+            client.profile,
+            track=Track(client._request),
+            policy=PollPolicy(failure_interval=7200),
+            tz="Europe/Paris",
+        )
+        await scheduler.poll(NOW)
+        due = [p.tracking_number for p in scheduler.due(NOW + 3600)]
+        assert "LP00000000000001" in due
+
+        [package] = await scheduler.poll(NOW + 3600)
+        assert requested_numbers == [due]
+
+        # The listing's ID and friendly name are kept:
+        assert package.status == "Delivered"
+        assert package.timestamp == datetime(2021, 3, 9, 9, tzinfo=UTC)
+        assert package.id == "100000000000000001"
+        assert package.friendly_name == "Package 1"
+        assert scheduler.packages["LP00000000000001"] == package
+
+        # Packages that couldn't be looked up are retried later (not on every poll):
+        for number in due[1:]:
+            assert scheduler.next_checks[number] == NOW + 3600 + 7200
+        assert await scheduler.poll(NOW + 3660) == []
+        assert len(requested_numbers) == 1
@@ -0,0 +1,118 @@
+"""Define tests for the SQLite package store."""
+import aiohttp
+import pytest
+
+from py17track import Client
+from py17track.errors import RequestError, SeventeenTrackError
+from py17track.store import PackageStore, StoredProfile
+
+from .common import load_fixture, paged_packages_handler
+
+
+@pytest.mark.asyncio
+async def test_warm_start(aresponses, tmp_path):
+    """Test that stored packages are served immediately after a restart."""
+    for _ in range(6):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(),
+        )
+
+    path = str(tmp_path / "packages.db")
+
+    async with aiohttp.ClientSession() as session:
+        # A cold start fetches (and stores) every package:
+        client = Client(session=session)
+        store = PackageStore(path)
+        stored = StoredProfile(client.profile, store, account_id="123", page_size=2)
+        packages = await stored.packages()
+        assert len(packages) == 5
+        assert stored.reconcile_task is None
+        store.close()
+
+        # After a "restart", packages come from the store and are reconciled in the
+        # background:
+        client = Client(session=session)
+        store = PackageStore(path)
+        stored = StoredProfile(client.profile, store, account_id="123", page_size=2)
+        warm_packages = await stored.packages()
+        assert warm_packages == packages
+        assert stored.reconcile_task is not None
+        await stored.reconcile_task
+
+        in_transit = await stored.packages(10, reconcile=False)
+        assert [p.tracking_number for p in in_transit] == [
+            "LP00000000000001",
+            "LP00000000000003",
+        ]
+        assert await stored.packages("In Transit", reconcile=False) == in_transit
+
+        # Like Profile.summary(), only statuses that have packages are included:
+        summary = await stored.summary(reconcile=False)
+        assert summary["In Transit"] == 2
+        assert summary["Delivered"] == 1
+        assert "Expired" not in summary
+        store.close()
+
+    aresponses.assert_all_requests_matched()
+
+
+@pytest.mark.asyncio
+async def test_no_account_id(tmp_path):
+    """Test that an account ID is required (rather than sharing a bucket)."""
+    client = Client()
+    store = PackageStore(str(tmp_path / "packages.db"))
+    stored = StoredProfile(client.profile, store)
+    with pytest.raises(SeventeenTrackError):
+        await stored.packages()
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_error_keeps_rows(aresponses):
+    """Test that an error response never wipes the stored packages."""
+    aresponses.add(
+        "buyer.17track.net",
+        "/orderapi/call",
+        "post",
+        aresponses.Response(
+            text=load_fixture("auth_expired_response.json"), status=200
+        ),
+    )
+
+    row = {"FTrackNo": "A", "FTrackInfoId": "1", "FLastEvent": "", "FPackageState": 10}
+    store = PackageStore()
+    store.save_rows("123", [row])
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        stored = StoredProfile(client.profile, store, account_id="123")
+        with pytest.raises(RequestError):
+            await stored.reconcile()
+
+    assert store.load_rows("123") == [row]
+    store.close()
+
+
+def test_store_rows():
+    """Test storing and loading raw rows."""
+    store = PackageStore()
+    assert not store.has_account("123")
+    assert store.save_rows("123", []) == 0
+    assert store.has_account("123")
+    assert store.load_rows("123") == []
+
+    row = {
+        "FTrackNo": "LP1",
+        "FTrackInfoId": "1",
+        "FLastEvent": "",
+        "FPackageState": 40,
+    }
+    store.save_rows("123", [row])
+    store.save_rows("456", [row, dict(row, FTrackNo="LP2")])
+    assert store.load_rows("123") == [row]
+    assert len(store.load_rows("456", status=[40])) == 2
+    assert store.load_rows("456", status=[10]) == []
+    store.close()
@@ -0,0 +1,57 @@
+"""Define tests for the package sync engine."""
+import aiohttp
+import pytest
+
+from py17track import Client
+from py17track.package import Package
+from py17track.sync import PackageSync
+
+from .common import paged_packages_handler
+
+
+@pytest.mark.asyncio
+async def test_poll(aresponses):
+    """Test that the first poll adds every package and the next reports no changes."""
+    for _ in range(6):
+        aresponses.add(
+            "buyer.17track.net",
+            "/orderapi/call",
+            "post",
+            paged_packages_handler(),
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        sync = PackageSync(client.profile, page_size=2)
+
+        delta = await sync.poll()
+        assert len(delta.added) == 5
+        assert sync.get("100000000000000003").location == "Italy"
+        assert sync.get("LP00000000000003") is sync.get("100000000000000003")
+        assert sync.get("LP00000000000009") is None
+
+        delta = await sync.poll()
+        assert not delta
+
+
+def test_update():
+    """Test computing deltas between package lists."""
+    first = Package("1", id="a", status=10, timestamp="2021-03-05 10:00")
+    second = Package("2", id="b", friendly_name="Shoes", status=10)
+    third = Package("3", id="c", status=40)
+
+    sync = PackageSync(None)
+    sync.update([first, second, third])
+
+    moved = Package(
+        "1", id="a", status=30, timestamp="2021-03-06 10:00", info_text="Pickup"
+    )
+    renamed = Package("2", id="b", friendly_name="Boots", status=10)
+    new = Package("4", id="d")
+
+    delta = sync.update([moved, renamed, new])
+    assert delta.added == [new]
+    assert delta.removed == [third]
+    assert [(c.previous, c.current) for c in delta.status_changed] == [(first, moved)]
+    assert [(c.previous, c.current) for c in delta.new_events] == [(first, moved)]
+    assert [(c.previous, c.current) for c in delta.renamed] == [(second, renamed)]
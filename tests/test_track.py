@@ -0,0 +1,126 @@
+"""Define tests for tracking number lookups."""
+from datetime import datetime
+
+import aiohttp
+from aiohttp import web
+import pytest
+from pytz import UTC
+
+from py17track import Client
+from py17track.errors import InvalidTrackingNumberError, RequestError
+from py17track.track import Track
+
+
+def track_handler(requested_chunks):
+    """Return an aresponses handler that emulates the tracking API."""
+
+    async def handler(request):
+        """Respond with tracking info for every requested number."""
+        payload = await request.json()
+        numbers = [item["num"] for item in payload["data"]]
+        requested_chunks.append(numbers)
+
+        if any(num.startswith("ERROR") for num in numbers):
+            return web.Response(text="", status=500)
+        if all(num.startswith("INVALID") for num in numbers):
+            return web.json_response({"dat": []})
+
+        dat = []
+        for num in numbers:
+            if num.startswith("MISSING"):
+                continue
+            if num.startswith("INVALID"):
+                dat.append({"no": num, "track": {}})
+                continue
+            dat.append(
+                {
+                    "no": num,
+                    "track": {
+                        "b": 2105,
+                        "c": 704,
+                        "d": 1,
+                        "e": 10,
+                        "ln1": "en",
+                        "z0": {"a": "2021-03-05 10:00", "c": "Berlin", "z": "Sorted"},
+                    },
+                }
+            )
+        return web.json_response({"dat": dat})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_find(aresponses):
+    """Test finding tracking numbers in concurrently-requested chunks."""
+    requested_chunks = []
+    for _ in range(4):
+        aresponses.add(
+            "t.17track.net", "/restapi/track", "post", track_handler(requested_chunks)
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        track = Track(client._request)
+        numbers = [f"LP{idx}" for idx in range(5)]
+        packages = await track.find(*numbers, chunk_size=2)
+        [paris_package] = await track.find("LP0", tz="Europe/Paris")
+
+    assert sorted(len(chunk) for chunk in requested_chunks) == [1, 1, 2, 2]
+    assert [package.tracking_number for package in packages] == numbers
+    assert packages[0].origin_country == "United States"
+    assert packages[0].destination_country == "Germany"
+    assert packages[0].status == "In Transit"
+    assert packages[0].location == "Berlin"
+    assert packages[0].timestamp == datetime(2021, 3, 5, 10, tzinfo=UTC)
+    assert paris_package.timestamp == datetime(2021, 3, 5, 9, tzinfo=UTC)
+
+
+@pytest.mark.asyncio
+async def test_find_many_failures(aresponses):
+    """Test that failed numbers and chunks are reported without losing the rest."""
+    requested_chunks = []
+    for _ in range(3):
+        aresponses.add(
+            "t.17track.net", "/restapi/track", "post", track_handler(requested_chunks)
+        )
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        track = Track(client._request)
+        result = await track.find_many(
+            ["LP1", "INVALID1", "ERROR1", "LP2", "INVALID2", "INVALID3"], chunk_size=2
+        )
+
+    assert [package.tracking_number for package in result.packages] == ["LP1"]
+    assert set(result.failures) == {"INVALID1", "ERROR1", "LP2", "INVALID2", "INVALID3"}
+    assert isinstance(result.failures["INVALID1"], InvalidTrackingNumberError)
+    assert isinstance(result.failures["ERROR1"], RequestError)
+    assert isinstance(result.failures["INVALID2"], InvalidTrackingNumberError)
+
+
+@pytest.mark.asyncio
+async def test_find_many_missing(aresponses):
+    """Test that numbers missing from a response are reported as failures."""
+    aresponses.add("t.17track.net", "/restapi/track", "post", track_handler([]))
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        track = Track(client._request)
+        result = await track.find_many(["LP1", "MISSING1", "LP2"])
+
+    assert [package.tracking_number for package in result.packages] == ["LP1", "LP2"]
+    assert set(result.failures) == {"MISSING1"}
+    assert isinstance(result.failures["MISSING1"], InvalidTrackingNumberError)
+
+
+@pytest.mark.asyncio
+async def test_find_invalid(aresponses):
+    """Test that an error is raised when every chunk fails."""
+    aresponses.add("t.17track.net", "/restapi/track", "post", track_handler([]))
+
+    async with aiohttp.ClientSession() as session:
+        client = Client(session=session)
+        track = Track(client._request)
+        with pytest.raises(InvalidTrackingNumberError):
+            await track.find("INVALID1", "INVALID2")
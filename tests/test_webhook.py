@@ -0,0 +1,123 @@
+"""Define tests for the push notification receiver."""
+from hashlib import sha256
+import json
+
+import pytest
+
+from py17track.webhook import WebhookReceiver
+
+
+def notification(number, timestamp="2021-03-05 10:00", status=10):
+    """Return a push notification for a single package."""
+    return {
+        "event": "TRACKING_UPDATED",
+        "data": {
+            "number": number,
+            "track": {
+                "b": 2105,
+                "c": 704,
+                "d": 1,
+                "e": status,
+                "ln1": "en",
+                "z0": {"a": timestamp, "c": "Berlin", "z": "Sorted"},
+            },
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_handle():
+    """Test that updates are parsed, deduplicated and delivered."""
+    receiver = WebhookReceiver()
+    received = []
+    delivered = []
+
+    async def on_update(package):
+        delivered.append(package)
+
+    receiver.subscribe(received.append)
+    unsubscribe = receiver.subscribe(on_update)
+
+    [package] = await receiver.handle(notification("LP1"))
+    assert package.status == "In Transit"
+    assert package.location == "Berlin"
+    assert package.destination_country == "Germany"
+
+    # Duplicates and stale updates are dropped:
+    assert await receiver.handle(notification("LP1")) == []
+    assert await receiver.handle(notification("LP1", "2021-03-04 10:00")) == []
+
+    unsubscribe()
+    await receiver.handle(notification("LP1", "2021-03-06 10:00", status=40))
+
+    assert [p.status for p in received] == ["In Transit", "Delivered"]
+    assert [p.status for p in delivered] == ["In Transit"]
+    assert receiver.latest["LP1"].status == "Delivered"
+
+
+@pytest.mark.asyncio
+async def test_handle_subscriber_error():
+    """Test that an update a subscriber failed on is delivered again on retry."""
+    receiver = WebhookReceiver()
+    received = []
+    failures = [ValueError("Subscriber bug")]
+
+    def flaky(package):
+        if failures:
+            raise failures.pop()
+
+    receiver.subscribe(flaky)
+    receiver.subscribe(received.append)
+
+    with pytest.raises(ValueError):
+        await receiver.handle(notification("LP1"))
+    assert "LP1" not in receiver.latest
+
+    # The retried notification isn't treated as a duplicate:
+    [package] = await receiver.handle(notification("LP1"))
+    assert receiver.latest["LP1"] == package
+    assert len(received) == 2
+
+
+@pytest.mark.asyncio
+async def test_endpoint(aiohttp_client):
+    """Test posting notifications (with and without valid signatures)."""
+    receiver = WebhookReceiver(secret="s3cr3t")
+    client = await aiohttp_client(receiver.app())
+
+    body = json.dumps(notification("LP1")).encode()
+    signature = sha256(body + b"/s3cr3t").hexdigest()
+
+    resp = await client.post(receiver.path, data=body, headers={"sign": "wrong"})
+    assert resp.status == 401
+
+    resp = await client.post(receiver.path, data=body, headers={"sign": signature})
+    assert resp.status == 200
+    assert await resp.json() == {"code": 0, "updates": 1}
+
+    body = b'{"data": [{"track": {}}]}'
+    signature = sha256(body + b"/s3cr3t").hexdigest()
+    resp = await client.post(receiver.path, data=body, headers={"sign": signature})
+    assert resp.status == 400
+
+    # Subscriber errors ask the sender to retry (rather than rejecting the payload):
+    def broken(package):
+        raise ValueError("Subscriber bug")
+
+    receiver.subscribe(broken)
+    body = json.dumps(notification("LP2")).encode()
+    signature = sha256(body + b"/s3cr3t").hexdigest()
+    resp = await client.post(receiver.path, data=body, headers={"sign": signature})
+    assert resp.status == 500
+    assert "LP2" not in receiver.latest
+
+
+@pytest.mark.asyncio
+async def test_start_requires_secret_off_loopback():
+    """Test that only a receiver with a secret listens on non-loopback addresses."""
+    receiver = WebhookReceiver()
+    with pytest.raises(ValueError):
+        await receiver.start(host="0.0.0.0", port=0)
+
+    await receiver.start(port=0)
+    await receiver.close()